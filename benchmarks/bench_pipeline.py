@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Wall time and peak memory of each pipeline stage on synthetic collections.
+
+Run from Anki's addons21 folder (the add-on itself never imports aqt here):
+
+    python -m <addon folder>.benchmarks.bench_pipeline --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from ..engine import SearchEngine, filter_set, open_collection, fetch_seed_tags
+from ..qid_index import qid_array
+from ..qidset import QidSet
+from ..selection import mix_batch
+from .synth import DAY_MS, make_collection
+
+ALL_STATES = {"learning": True, "young": True, "mature": True}
+
+class StageTimer:
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.rows = []
+
+    def run(self, label, fn):
+        if self.memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        peak = 0
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.rows.append({"stage": label, "seconds": elapsed, "peak_kb": peak // 1024})
+        return result
+
+def bench_size(rows, workdir, depths, memory):
+    coll_path = os.path.join(workdir, f"synthetic_{rows}.anki2")
+    if not os.path.exists(coll_path):
+        make_collection(coll_path, rows)
+    data_dir = tempfile.mkdtemp(prefix="uw_bench_", dir=workdir)
+    db = open_collection(coll_path)
+    engine = SearchEngine(data_dir, "bench")
+    timer = StageTimer(memory)
+    try:
+        now_ms = int(time.time() * 1000)
+        week = (now_ms - 7 * DAY_MS, now_ms)
+        month = (now_ms - 30 * DAY_MS, now_ms)
+        day = (now_ms - DAY_MS, now_ms)
+
+        def seed_sql():
+            return set(qid_array(fetch_seed_tags(db, week[0], week[1], ALL_STATES)))
+
+        timer.run("index build (cold)", lambda: engine.index(db))
+        timer.run("index refresh (warm)", lambda: engine.index(db))
+        seeds = timer.run("seed: bulk SQL, 7 days", seed_sql)
+        timer.run("seed: snapshots cold, 30 days", lambda: engine.range_qids(db, *month, ALL_STATES))
+        timer.run("seed: snapshots warm, 30 days", lambda: engine.range_qids(db, *month, ALL_STATES))
+        timer.run("seed: review cache cold, 24h", lambda: engine.recent_qids(db, *day, ALL_STATES, 0))
+        timer.run("seed: review cache warm, 24h", lambda: engine.recent_qids(db, *day, ALL_STATES, 0))
+        timer.run("graph build", lambda: engine.graph(db))
+
+        index = engine.index(db)
+        pool = list(index.qid_notes)
+        rnd = random.Random(1)
+        invalid = QidSet(rnd.sample(pool, len(pool) // 20))
+        correct = QidSet(rnd.sample(pool, len(pool) // 5))
+        graph = engine.graph(db)
+        for depth in depths:
+            hops = timer.run(f"tree search, depth {depth}", lambda: graph.expand(seeds, depth))
+            filtered = timer.run(f"filter, depth {depth}", lambda: (
+                filter_set(seeds, invalid, correct), filter_set(hops, invalid, correct)))
+            timer.run(f"mix, depth {depth}", lambda: mix_batch(
+                filtered[0], filtered[1], hops, True, depth, 50, 40, True))
+            timer.rows[-3]["qids"] = len(hops)
+    finally:
+        engine.close()
+        db.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return {"revlog_rows": rows, "direct_qids": len(seeds), "stages": timer.rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma separated revlog row counts")
+    parser.add_argument("--depths", default="1,2,3,4,5")
+    parser.add_argument("--workdir", default=None,
+                        help="where synthetic collections are kept (reused between runs)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc (it slows Python-heavy stages)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "uworld_bench")
+    os.makedirs(workdir, exist_ok=True)
+    depths = [int(x) for x in args.depths.split(",")]
+    results = [bench_size(int(rows), workdir, depths, not args.no_memory)
+               for rows in args.sizes.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"\n== {result['revlog_rows']:,} revlog rows ({result['direct_qids']} direct QIDs, 7 days) ==")
+        print(f"{'stage':34} {'ms':>10} {'peak KB':>10} {'QIDs':>8}")
+        for row in result["stages"]:
+            print(f"{row['stage']:34} {row['seconds'] * 1000:10.1f} {row['peak_kb']:10} {row.get('qids', ''):>8}")
+
+if __name__ == "__main__":
+    main()
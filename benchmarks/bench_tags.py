@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Throughput of tag -> QID extraction: per-tag regex loop vs chunked bulk pass.
+
+Run from Anki's addons21 folder:
+
+    python -m <addon folder>.benchmarks.bench_tags --notes 10000,40000,200000 --noise 10
+
+Real decks carry many non-UWorld tags per note; --noise appends that many
+to each synthetic note (the per-tag loop pays for every one of them).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from ..engine import open_collection
+from ..qid_index import extract_qids, extract_uworld_tags, qid_array, tag_regex
+from .synth import NOISE_TAGS, make_collection
+
+MORE_NOISE = NOISE_TAGS + (
+    "#AK_Step1_v12::#Pathoma::Ch08_Cardiac", "#AK_Step2_v12::#OME::Cardio::Heart_Failure",
+    "#AK_Step1_v12::#SketchyPharm::Cardio", "#AK_Original_Decks::Zanki", "#AK_Step1_v12::!Shelf::IM",
+)
+
+def best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def per_tag_uworld_tags(tags_str):
+    # The extraction before the substring pre-checks, for comparison
+    return tuple(sorted({tag for tag in tags_str.split() if tag_regex.search(tag)}))
+
+def bench_notes(notes, workdir, repeat, noise):
+    coll_path = os.path.join(workdir, f"synthetic_notes_{notes}.anki2")
+    if not os.path.exists(coll_path):
+        make_collection(coll_path, notes * 2, notes=notes)
+    db = open_collection(coll_path)
+    try:
+        tag_strings = db.list("SELECT tags FROM notes")
+    finally:
+        db.close()
+    if noise:
+        rnd = random.Random(0)
+        tag_strings = [tags + " ".join(rnd.choice(MORE_NOISE) for _ in range(noise)) + " "
+                       for tags in tag_strings]
+    megabytes = sum(len(t) for t in tag_strings) / 1e6
+
+    def per_note_qids():
+        found = set()
+        for tags in tag_strings:
+            extract_qids(tags, found)
+        return found
+
+    cases = [
+        ("QIDs: per-tag loop", per_note_qids, None),
+        ("QIDs: bulk qid_array", lambda: set(qid_array(tag_strings)), "QIDs: per-tag loop"),
+        ("index tags: per-tag loop", lambda: [per_tag_uworld_tags(t) for t in tag_strings], None),
+        ("index tags: pre-checked", lambda: [extract_uworld_tags(t) for t in tag_strings],
+         "index tags: per-tag loop"),
+    ]
+    rows, results = [], {}
+    for label, fn, same_as in cases:
+        seconds, results[label] = best_of(repeat, fn)
+        if same_as and results[label] != results[same_as]:
+            raise AssertionError(f"{label} disagrees with {same_as}")
+        rows.append({"stage": label, "seconds": seconds,
+                     "notes_per_s": len(tag_strings) / seconds, "mb_per_s": megabytes / seconds})
+    return {"notes": len(tag_strings), "megabytes": megabytes, "stages": rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", default="10000,40000,200000", help="comma separated note counts")
+    parser.add_argument("--noise", type=int, default=10, help="extra non-UWorld tags per note")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs per stage")
+    parser.add_argument("--workdir", default=None,
+                        help="where synthetic collections are kept (reused between runs)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "uworld_bench")
+    os.makedirs(workdir, exist_ok=True)
+    results = [bench_notes(int(n), workdir, args.repeat, args.noise) for n in args.notes.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"\n== {result['notes']:,} notes ({result['megabytes']:.1f} MB of tags) ==")
+        print(f"{'stage':28} {'ms':>10} {'notes/s':>12} {'MB/s':>8}")
+        for row in result["stages"]:
+            print(f"{row['stage']:28} {row['seconds'] * 1000:10.1f} "
+                  f"{row['notes_per_s']:12,.0f} {row['mb_per_s']:8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Synthetic Anki-schema collections with UWorld-style tags for benchmarks."""
+import os
+import random
+import sqlite3
+import time
+
+DAY_MS = 86400 * 1000
+
+# Only the tables/columns the add-on reads, with Anki's names and indexes
+SCHEMA = """
+CREATE TABLE col (id integer primary key, crt integer, mod integer, scm integer,
+    ver integer, dty integer, usn integer, ls integer, conf text, models text,
+    decks text, dconf text, tags text);
+CREATE TABLE notes (id integer primary key, guid text, mid integer, mod integer,
+    usn integer, tags text, flds text, sfld integer, csum integer, flags integer, data text);
+CREATE TABLE cards (id integer primary key, nid integer, did integer, ord integer,
+    mod integer, usn integer, type integer, queue integer, due integer, ivl integer,
+    factor integer, reps integer, lapses integer, left integer, odue integer,
+    odid integer, flags integer, data text);
+CREATE TABLE revlog (id integer primary key, cid integer, usn integer, ease integer,
+    ivl integer, lastIvl integer, factor integer, time integer, type integer);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+"""
+
+TAG_PREFIXES = ("#AK_Step1_v12::#UWorld::Step1", "UWorld::Step1", "#UWorld::Step1::Cardiology")
+NOISE_TAGS = ("#AK_Step1_v12::^Systems::Cardio", "#AK_Step1_v12::#B&B::Pharm", "leech", "marked")
+
+def default_notes(revlog_rows):
+    return min(40000, max(2000, revlog_rows // 5))
+
+def make_collection(path, revlog_rows, notes=None, days=365, qid_pool=4000, seed=0):
+    """Write a collection with ``revlog_rows`` reviews spread over ``days`` days."""
+    rnd = random.Random(seed)
+    notes = notes or default_notes(revlog_rows)
+    if os.path.exists(path): os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    now_ms = int(time.time() * 1000)
+    now = now_ms // 1000
+    conn.execute("INSERT INTO col (id, crt, mod) VALUES (1, ?, ?)", (now - days * 86400, now_ms))
+
+    # QIDs: a Step-1-sized bank with Zipf-like popularity across notes
+    qids = rnd.sample(range(1, 25000), qid_pool)
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(qid_pool)]
+
+    note_rows, card_rows = [], []
+    base_nid = now_ms - days * DAY_MS - notes * 10
+    for i in range(notes):
+        nid = base_nid + i * 7
+        tags = list(rnd.sample(NOISE_TAGS, rnd.randint(0, 2)))
+        if rnd.random() < 0.6:
+            prefix = rnd.choice(TAG_PREFIXES)
+            k = min(12, 1 + int(rnd.expovariate(0.5)))
+            tags.extend(f"{prefix}::{q}" for q in set(rnd.choices(qids, weights, k=k)))
+        note_rows.append((nid, f"g{i}", 1, rnd.randint(now - days * 86400, now), -1,
+                          " " + " ".join(tags) + " " if tags else "", "", "", 0, 0, ""))
+        for ord_ in range(1 if rnd.random() < 0.8 else 2):
+            roll = rnd.random()
+            queue = 0 if roll < 0.35 else (1 if roll < 0.40 else (3 if roll < 0.42 else (2 if roll < 0.95 else -1)))
+            ivl = int(rnd.lognormvariate(2.5, 1.2)) if queue in (2, -1) else 0
+            card_rows.append((nid + ord_, nid, 1, ord_, rnd.randint(now - days * 86400, now), -1,
+                              2 if queue == 2 else queue, queue, 0, ivl, rnd.choice((1300, 2100, 2500, 2800)),
+                              rnd.randint(0, 30), int(rnd.expovariate(1.0)), 0, 0, 0, 0, ""))
+    conn.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", note_rows)
+    conn.executemany("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", card_rows)
+
+    # Reviews: studied cards only, a heavy tail of cards reviewed many times
+    studied = [row[0] for row in card_rows if row[7] != 0]
+    review_weights = [rnd.paretovariate(1.5) for _ in studied]
+    start_ms = now_ms - days * DAY_MS
+    rids = sorted(rnd.sample(range(start_ms, now_ms), revlog_rows))
+    cids = rnd.choices(studied, review_weights, k=revlog_rows)
+    conn.executemany(
+        "INSERT INTO revlog VALUES (?,?,?,?,?,?,?,?,?)",
+        ((rid, cid, -1, rnd.choice((1, 3, 3, 3, 4)), 1, 1, 2500, 8000, 1) for rid, cid in zip(rids, cids)))
+    conn.commit()
+    conn.close()
+    return path
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Generate UWorld QID batches from a collection file without Anki running.
+
+The collection is opened read-only and nothing is written next to it. Run
+from Anki's addons21 folder, e.g. one batch per day for the last 30 days:
+
+    python -m <addon folder>.cli "path/to/collection.anki2" --days 30 --depths 0,1 --out schedule.csv
+
+Blocked IDs and UWorld Helper's correct list are read from the usual
+add-on locations unless --include-correct / --no-blocklist are given.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import product
+
+from .engine import add_tag_relatives, fetch_seed_nids, filter_set, open_collection
+from .qid_graph import QidGraph
+from .qid_index import QidIndex
+from .qidset import QidSet
+from .selection import mix_batch
+from .storage import load_correct_ids_from_helper, load_invalid_ids
+
+STATES = ("learning", "young", "mature")
+
+# ============================================================
+# WORKERS
+# ============================================================
+_shared = {}  # per process: read-only connection plus the pre-read index
+
+def _init_worker(coll_path, index, graph, invalid_ids, correct_ids):
+    _shared.update(db=open_collection(coll_path), index=index, graph=graph,
+                   invalid_ids=invalid_ids, correct_ids=correct_ids)
+
+def run_job(job):
+    db, index = _shared["db"], _shared["index"]
+    states = dict.fromkeys(job["states"], True)
+    seeds = set()
+    for nid in fetch_seed_nids(db, job["start_ms"], job["end_ms"], states):
+        seeds.update(index.qids_for(nid))
+
+    depth, tag_level = job["depth"], job["tag_level"]
+    horizontal_mode = bool(depth or tag_level)
+    hops = _shared["graph"].expand(seeds, depth) if depth else {}
+    if tag_level: add_tag_relatives(index, seeds, hops, depth, tag_level)
+
+    direct = filter_set(seeds, _shared["invalid_ids"], _shared["correct_ids"])
+    horizontal = filter_set(hops, _shared["invalid_ids"], _shared["correct_ids"])
+    rng = random.Random(job["seed"])
+    selection = mix_batch(direct, horizontal, hops, horizontal_mode, max(depth, 1),
+                          job["mix"], job["batch_size"], job["randomize"], rng=rng,
+                          blocks=job["blocks"])
+    return dict(job, direct=len(direct), horizontal=len(horizontal), candidates=len(selection),
+                batch=[selection.block(b) for b in range(selection.block_count)])
+
+# ============================================================
+# JOBS & OUTPUT
+# ============================================================
+def day_windows(days, rollover, now=None):
+    # Anki-style days that start at the rollover hour; the newest ends now
+    now = now or datetime.now()
+    start = now.replace(hour=rollover, minute=0, second=0, microsecond=0)
+    if start > now: start -= timedelta(days=1)
+    windows = []
+    end = now
+    for _ in range(days):
+        windows.append((start, end))
+        end = start - timedelta(milliseconds=1)
+        start -= timedelta(days=1)
+    return windows
+
+def parse_window(text):
+    start, end = text.split(",")
+    return datetime.fromisoformat(start.strip()), datetime.fromisoformat(end.strip())
+
+def write_results(results, out):
+    rows = [dict(r, states="+".join(r["states"])) for r in results]
+    if out.endswith(".json"):
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+        return
+    # One column per block; rows with fewer blocks leave the rest empty
+    block_fields = [f"block_{b + 1}" for b in range(max((len(r["batch"]) for r in rows), default=1))]
+    fields = ["start", "end", "states", "depth", "tag_level", "direct", "horizontal",
+              "candidates", "blocks"] + block_fields
+    f = sys.stdout if out == "-" else open(out, "w", encoding="utf-8", newline="")
+    try:
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, **{name: ", ".join(map(str, block))
+                                         for name, block in zip(block_fields, row["batch"])}))
+    finally:
+        if f is not sys.stdout: f.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collection", help="path to collection.anki2")
+    parser.add_argument("--days", type=int, default=0,
+                        help="one window per day for the last N days (default 1 without --window)")
+    parser.add_argument("--rollover", type=int, default=4, help="hour a new day starts, as in Anki")
+    parser.add_argument("--window", action="append", default=[],
+                        help="explicit window START,END in ISO format (repeatable)")
+    parser.add_argument("--states", action="append", default=[],
+                        help="comma separated card states, e.g. learning,young (repeatable; default all)")
+    parser.add_argument("--depths", default="0", help="tree search layers per job, 0 = direct only")
+    parser.add_argument("--tag-level", type=int, default=0,
+                        help="shared tag ancestor level below UWorld::Step, 0 = off")
+    parser.add_argument("--batch-size", type=int, default=40)
+    parser.add_argument("--blocks", type=int, default=1)
+    parser.add_argument("--mix", type=int, default=50, help="horizontal batch share in percent")
+    parser.add_argument("--sorted", action="store_true", help="deterministic batches instead of random")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible batches")
+    parser.add_argument("--include-correct", action="store_true")
+    parser.add_argument("--no-blocklist", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="-", help="output .csv or .json file (default CSV on stdout)")
+    args = parser.parse_args(argv)
+
+    windows = [parse_window(w) for w in args.window]
+    if args.days or not windows:
+        windows += day_windows(args.days or 1, args.rollover)
+    state_sets = [tuple(s.strip() for s in group.split(",") if s.strip()) for group in args.states]
+    state_sets = state_sets or [STATES]
+    for states in state_sets:
+        unknown = set(states) - set(STATES)
+        if unknown: parser.error(f"unknown card state(s): {', '.join(sorted(unknown))}")
+    depths = [int(x) for x in args.depths.split(",")]
+
+    # Read once here, then shared with every worker
+    db = open_collection(args.collection)
+    try:
+        index = QidIndex(None)
+        index.refresh(db)
+    finally:
+        db.close()
+    if args.tag_level and args.tag_level > index.trie.levels():
+        print(f"--tag-level {args.tag_level}: the UWorld tags only go {index.trie.levels()} "
+              "level(s) deep below Step", file=sys.stderr)
+    graph = QidGraph(None)
+    if any(depths): graph.build(index, "cli")
+    invalid_ids = QidSet() if args.no_blocklist else load_invalid_ids()
+    correct_ids = None if args.include_correct else load_correct_ids_from_helper()
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    jobs = []
+    for (start, end), states, depth in product(windows, state_sets, depths):
+        jobs.append({
+            "start": start.isoformat(timespec="seconds"), "end": end.isoformat(timespec="seconds"),
+            "start_ms": int(start.timestamp() * 1000), "end_ms": int(end.timestamp() * 1000),
+            "states": states, "depth": depth, "tag_level": args.tag_level,
+            "batch_size": args.batch_size, "blocks": args.blocks, "mix": args.mix,
+            "randomize": not args.sorted, "seed": seed + len(jobs),
+        })
+
+    init_args = (args.collection, index, graph, invalid_ids, correct_ids)
+    if args.workers <= 1 or len(jobs) == 1:
+        _init_worker(*init_args)
+        results = [run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=init_args) as pool:
+            results = list(pool.map(run_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+    for result in results:
+        del result["start_ms"], result["end_ms"], result["seed"]
+    write_results(results, args.out)
+    print(f"{len(results)} batches written to {args.out if args.out != '-' else 'stdout'}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
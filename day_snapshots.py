@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from .review_cache import card_state
+
+DAY_MS = 86400 * 1000
+STATES = ("learning", "young", "mature")
+
+# ============================================================
+# PER-DAY REVIEW -> QID SNAPSHOTS
+# ============================================================
+class DaySnapshots:
+    """Materialized cards reviewed per (UTC) day.
+
+    Each closed day lives in ``<day>.json`` inside ``dir_path`` as the sorted
+    card ids reviewed that day; the manifest records each materialized day's
+    revlog row count. A day is rebuilt only when its count no longer matches
+    (reviews undone, deleted, imported or synced in). Card state and QIDs are
+    looked up at query time, so edited, rescheduled and deleted cards and
+    notes never leave a snapshot stale.
+    """
+    VERSION = 4
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        self.days = {}         # materialized day -> revlog rows it was built from
+        self.loaded = {}       # day -> set of card ids
+        self.last_stats = {}   # counts from the latest query (diagnostics)
+
+    def load(self):
+        path = os.path.join(self.dir_path, "manifest.json")
+        if not os.path.exists(path): return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION: return
+            self.days = {day: count for day, count in data["days"]}
+        except Exception as e:
+            print(f"Error loading day snapshots: {e}")
+            self.days = {}
+
+    def save(self):
+        self._write("manifest.json", {"version": self.VERSION, "days": sorted(self.days.items())})
+
+    # ---------- query ----------
+    @staticmethod
+    def full_days(start_ms, end_ms, today):
+        """Closed days lying entirely inside the window, as (first, last) or None."""
+        first = -(-int(start_ms) // DAY_MS)
+        last = min((int(end_ms) + 1) // DAY_MS - 1, today - 1)
+        return (first, last) if first <= last else None
+
+    def query(self, db, first, last, states, index):
+        counts = dict(db.all(
+            f"SELECT id / {DAY_MS}, count() FROM revlog "
+            f"WHERE id >= {first * DAY_MS} AND id < {(last + 1) * DAY_MS} GROUP BY 1"))
+        stale = [day for day in range(first, last + 1) if self.days.get(day) != counts.get(day, 0)]
+        if stale:
+            self.materialize(db, stale)
+
+        cids = set()
+        for day in range(first, last + 1):
+            cids.update(self._day(day))
+        wanted = {state for state in STATES if states.get(state)}
+        qids = set()
+        kept = 0
+        cids = list(cids)
+        for i in range(0, len(cids), 5000):
+            chunk = ",".join(str(cid) for cid in cids[i:i + 5000])
+            for nid, queue, ivl in db.all(f"SELECT nid, queue, ivl FROM cards WHERE id IN ({chunk})"):
+                if card_state(queue, ivl) in wanted:
+                    kept += 1
+                    qids.update(index.qids_for(nid))
+        self.last_stats = {"days": last - first + 1, "days_built": len(stale),
+                           "cards": len(cids), "cards_kept": kept}
+        return qids
+
+    # ---------- build ----------
+    def materialize(self, db, days):
+        for lo, hi in _runs(sorted(days)):
+            built = {day: set() for day in range(lo, hi + 1)}
+            counts = dict.fromkeys(built, 0)
+            rows = db.all(
+                f"SELECT id / {DAY_MS}, cid, count() FROM revlog "
+                f"WHERE id >= {lo * DAY_MS} AND id < {(hi + 1) * DAY_MS} GROUP BY 1, 2")
+            for day, cid, count in rows:
+                built[day].add(cid)
+                counts[day] += count
+            for day, cids in built.items():
+                if cids:
+                    self._write(f"{day}.json", sorted(cids))
+                else:
+                    self._remove(f"{day}.json")
+                self.loaded[day] = cids
+                self.days[day] = counts[day]
+        self.save()
+
+    def backfill(self, db, today, max_days=60):
+        """Materialize up to ``max_days`` of older history. Returns days left."""
+        oldest = db.scalar("SELECT min(id) FROM revlog")
+        if oldest is None: return 0
+        pending = [day for day in range(oldest // DAY_MS, today) if day not in self.days]
+        if pending:
+            # Newest first: recent ranges are the ones queried most
+            self.materialize(db, pending[-max_days:])
+        return max(0, len(pending) - max_days)
+
+    # ---------- files ----------
+    def _day(self, day):
+        cids = self.loaded.get(day)
+        if cids is None:
+            cids = set()
+            path = os.path.join(self.dir_path, f"{day}.json")
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        cids = set(json.load(f))
+                except Exception as e:
+                    print(f"Error loading day snapshot {day}: {e}")
+            self.loaded[day] = cids
+        return cids
+
+    def _write(self, name, data):
+        if not os.path.exists(self.dir_path):
+            os.makedirs(self.dir_path)
+        path = os.path.join(self.dir_path, name)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"Error saving {name}: {e}")
+
+    def _remove(self, name):
+        path = os.path.join(self.dir_path, name)
+        if os.path.exists(path):
+            try: os.remove(path)
+            except Exception as e: print(f"Error removing {name}: {e}")
+
+def _runs(days):
+    # [1, 2, 3, 7, 8] -> (1, 3), (7, 8)
+    start = prev = None
+    for day in days:
+        if start is None:
+            start = prev = day
+        elif day == prev + 1:
+            prev = day
+        else:
+            yield start, prev
+            start = prev = day
+    if start is not None:
+        yield start, prev
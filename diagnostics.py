@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from contextlib import contextmanager
+
+# ============================================================
+# PER-STAGE SEARCH TRACE
+# ============================================================
+class SearchTrace:
+    """Timings and counts for one Generate run, stage by stage."""
+
+    def __init__(self, **settings):
+        self.started = time.time()
+        self.settings = settings
+        self.stages = []        # [{"stage": name, "ms": float, **counts}]
+        self.db_calls = 0
+
+    @contextmanager
+    def stage(self, name, **counts):
+        entry = {"stage": name}
+        entry.update(counts)
+        t0 = time.perf_counter()
+        try:
+            yield entry  # callers add counts to the entry while the stage runs
+        finally:
+            entry["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            self.stages.append(entry)
+
+    def add(self, name, ms, **counts):
+        entry = {"stage": name, "ms": round(ms, 2)}
+        entry.update(counts)
+        self.stages.append(entry)
+
+    def total_ms(self):
+        return round(sum(s["ms"] for s in self.stages), 2)
+
+    def to_dict(self):
+        return {
+            "time": round(self.started, 3),
+            "settings": self.settings,
+            "total_ms": self.total_ms(),
+            "db_calls": self.db_calls,
+            "stages": self.stages,
+        }
+
+    def format_text(self):
+        lines = [f"Total {self.total_ms():.1f} ms, {self.db_calls} backend calls"]
+        for s in self.stages:
+            counts = ", ".join(f"{k}={v}" for k, v in s.items() if k not in ("stage", "ms"))
+            lines.append(f"  {s['stage']:<28} {s['ms']:>9.1f} ms  {counts}")
+        return "\n".join(lines)
+
+    def append_jsonl(self, path):
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.to_dict(), separators=(",", ":")) + "\n")
+        except Exception as e:
+            print(f"Error writing search trace: {e}")
+
+class CountingDB:
+    """Wraps a db handle and counts every backend round trip into a trace."""
+
+    def __init__(self, db, trace):
+        self._db = db
+        self._trace = trace
+
+    def all(self, sql, *args):
+        self._trace.db_calls += 1
+        return self._db.all(sql, *args)
+
+    def list(self, sql, *args):
+        self._trace.db_calls += 1
+        return self._db.list(sql, *args)
+
+    def scalar(self, sql, *args):
+        self._trace.db_calls += 1
+        return self._db.scalar(sql, *args)
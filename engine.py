@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""Search, filter and mixing pipeline with no dependency on aqt.
+
+Everything here talks to a collection through a ``db`` handle with Anki's
+``all``/``list``/``scalar`` methods: ``mw.col.db`` inside Anki, or
+``SqliteDB`` over a plain ``collection.anki2`` file for benchmarks and tools.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .day_snapshots import DAY_MS, DaySnapshots
+from .diagnostics import SearchTrace
+from .priority import qid_weights
+from .qid_graph import QidGraph
+from .qid_index import QidIndex, qid_array
+from .review_cache import ReviewCache
+
+# ============================================================
+# 1) COLLECTION ACCESS
+# ============================================================
+class SqliteDB:
+    """Minimal stand-in for Anki's DBProxy over a sqlite3 connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def all(self, sql, *args):
+        return self.conn.execute(sql, args).fetchall()
+
+    def list(self, sql, *args):
+        return [row[0] for row in self.conn.execute(sql, args)]
+
+    def scalar(self, sql, *args):
+        row = self.conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
+
+def open_collection(path, readonly=True):
+    if readonly:
+        uri = "file:" + os.path.abspath(path).replace("?", "%3f") + "?mode=ro"
+        return SqliteDB(sqlite3.connect(uri, uri=True, check_same_thread=False))
+    return SqliteDB(sqlite3.connect(path, check_same_thread=False))
+
+# Card state -> SQL condition on the cards table (mirrors queue/ivl checks)
+STATE_SQL = {
+    "learning": "c.queue IN (1, 3)",
+    "young": "(c.queue = 2 AND c.ivl < 21)",
+    "mature": "(c.queue = 2 AND c.ivl >= 21)",
+}
+
+def fetch_seed_tags(db, start_ms, end_ms, states):
+    # One joined pass: revlog window -> card state filter -> note tags
+    conds = [sql for key, sql in STATE_SQL.items() if states.get(key)]
+    if not conds: return []
+    return db.list(
+        "SELECT n.tags FROM notes n WHERE n.id IN ("
+        " SELECT c.nid FROM revlog r JOIN cards c ON c.id = r.cid"
+        f" WHERE r.id >= {int(start_ms)} AND r.id <= {int(end_ms)}"
+        f" AND ({' OR '.join(conds)}))"
+    )
+
+def fetch_seed_nids(db, start_ms, end_ms, states):
+    # Same window and state filter, but note ids only (QIDs come from an index)
+    conds = [sql for key, sql in STATE_SQL.items() if states.get(key)]
+    if not conds: return []
+    return db.list(
+        "SELECT DISTINCT c.nid FROM revlog r JOIN cards c ON c.id = r.cid"
+        f" WHERE r.id >= {int(start_ms)} AND r.id <= {int(end_ms)}"
+        f" AND ({' OR '.join(conds)})"
+    )
+
+class SearchCancelled(Exception):
+    pass
+
+def _no_progress(stage, partial_ids=None):
+    pass
+
+def add_tag_relatives(index, seed_qids, hops, depth, tag_level):
+    """Adds QIDs sharing the tag ancestor ``tag_level`` up to ``hops`` as
+    layer ``depth + 1``. Returns (related count, newly added count)."""
+    related = index.trie.related(seed_qids, tag_level)
+    new = [qid for qid in related if qid not in hops]
+    hops.update(dict.fromkeys(new, depth + 1))
+    return len(related), len(new)
+
+class ResultCache:
+    """LRU of (direct, horizontal, hops) search results.
+
+    Keys carry a collection token (col.mod plus the newest revlog id); when
+    the token moves, every entry computed against the old one is evicted.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.token = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def collection_token(db):
+        return (db.scalar("SELECT mod FROM col"), db.scalar("SELECT max(id) FROM revlog"))
+
+    def get(self, key, token):
+        if token != self.token:
+            self.entries.clear()
+            self.token = token
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, token, result):
+        if token != self.token: return
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+# ============================================================
+# 2) SEARCH ENGINE (per profile indexes + tree search)
+# ============================================================
+class SearchEngine:
+    """Owns one profile's QID index, graph, review cache and day snapshots.
+
+    Safe to call from a background thread; all shared state is behind
+    ``lock``.
+    """
+
+    def __init__(self, data_dir, profile="default"):
+        self.data_dir = data_dir
+        self.profile = profile
+        self.lock = threading.RLock()
+        self._index = None
+        self._graph = None
+        self._review_cache = None
+        self._snapshots = None
+        self.results = ResultCache()
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, f"{name}_{self.profile}")
+
+    def index(self, db):
+        with self.lock:
+            if self._index is None:
+                self._index = QidIndex(self._path("qid_index") + ".json")
+                self._index.load()
+            if self._index.refresh(db):
+                self._index.save()
+            return self._index
+
+    def graph(self, db, index=None):
+        with self.lock:
+            index = index or self.index(db)
+            if self._graph is None:
+                self._graph = QidGraph(self._path("qid_graph"))
+                self._graph.load()
+            if self._graph.stamp != index.qid_stamp:
+                self._graph.build(index, index.qid_stamp)
+                self._graph.save()
+            return self._graph
+
+    def neighbours(self, qids):
+        # Layer-1 neighbours from the last saved graph; never rebuilds it
+        with self.lock:
+            if self._graph is None:
+                self._graph = QidGraph(self._path("qid_graph"))
+                self._graph.load()
+            return self._graph.expand(qids, 1)
+
+    def snapshots(self):
+        with self.lock:
+            if self._snapshots is None:
+                self._snapshots = DaySnapshots(self._path("snapshots"))
+                self._snapshots.load()
+            return self._snapshots
+
+    def weights(self, db, qids, hops):
+        # Priority weights for the candidates, from their cards' current stats
+        # Under the lock: a hook on the main thread may edit the index's note sets
+        with self.lock:
+            return qid_weights(db, self.index(db), qids, hops, int(time.time() * 1000))
+
+    def tag_levels(self):
+        # Usable Tag Levels in the loaded index (0 = UWorld tags stop at Step)
+        with self.lock:
+            return self._index.trie.levels() if self._index is not None else 0
+
+    def notes_deleted(self, nids):
+        with self.lock:
+            if self._index is not None:
+                self._index.remove_notes(nids)
+
+    def notes_changed(self):
+        # Undo (or another op) may restore notes with their old mod and usn
+        with self.lock:
+            if self._index is not None:
+                self._index.notes_changed()
+
+    def close(self):
+        with self.lock:
+            if self._graph is not None: self._graph.close()
+
+    # ---------- seed QIDs ----------
+    def recent_qids(self, db, start_ms, end_ms, states, day_cutoff, index=None):
+        # "Reviewed Today" / "Last X hours": only revlog rows past the watermark are read
+        with self.lock:
+            index = index or self.index(db)
+            if self._review_cache is None:
+                self._review_cache = ReviewCache(self.profile)
+            return self._review_cache.query(db, start_ms, end_ms, states, day_cutoff, index)
+
+    def range_qids(self, db, start_ms, end_ms, states, index=None):
+        # "Between:" windows: whole closed days come from snapshots, edges from SQL
+        with self.lock:
+            index = index or self.index(db)
+            snapshots = self.snapshots()
+            today = int(time.time() * 1000) // DAY_MS
+            span = DaySnapshots.full_days(start_ms, end_ms, today)
+            qids = set()
+            snapshots.last_stats = {"days": 0, "days_built": 0, "cards": 0, "cards_kept": 0}
+            if span is None:
+                edges = [(start_ms, end_ms)]
+            else:
+                first, last = span
+                qids = snapshots.query(db, first, last, states, index)
+                edges = [(start_ms, first * DAY_MS - 1), ((last + 1) * DAY_MS, end_ms)]
+        for lo, hi in edges:
+            if lo <= hi:
+                qids.update(qid_array(fetch_seed_tags(db, lo, hi, states)))
+        return qids
+
+    def backfill_snapshots(self, db, max_days=60):
+        """Materialize a chunk of older history. Returns days still pending."""
+        today = int(time.time() * 1000) // DAY_MS
+        with self.lock:
+            return self.snapshots().backfill(db, today, max_days)
+
+    # ---------- full search ----------
+    def find_ids(self, db, time_range, states, horizontal_mode, depth=1,
+                 day_cutoff=None, progress=None, partial_filter=None, trace=None,
+                 window_key=None, tag_level=0):
+        """Returns (direct QIDs, horizontal QIDs, {horizontal QID: hop}) as sets.
+
+        ``day_cutoff`` selects the incremental review cache (windows ending
+        now); without it the date range path is used. Stage timings and
+        counts are recorded into ``trace`` when given. With a ``window_key``
+        (a hashable description of the timeframe) results are memoized until
+        the collection changes, so mixing-only changes skip the search.
+        A ``tag_level`` K > 0 also relates QIDs that share the UWorld tag
+        ancestor K levels up; those count as layer ``depth + 1``.
+        """
+        start_ms, end_ms = time_range
+        progress = progress or _no_progress
+        trace = trace or SearchTrace()
+
+        if window_key is None:
+            return self._find_ids(db, time_range, states, horizontal_mode, depth,
+                                  day_cutoff, progress, partial_filter, trace, tag_level)
+
+        key = (window_key, tuple(sorted(k for k, on in states.items() if on)),
+               horizontal_mode, depth if horizontal_mode else 0,
+               tag_level if horizontal_mode else 0)
+        with trace.stage("result cache") as entry:
+            with self.lock:
+                token = ResultCache.collection_token(db)
+                result = self.results.get(key, token)
+            entry.update(hit=result is not None)
+        if result is not None:
+            progress("Reusing cached search results")
+            return result
+
+        result = self._find_ids(db, time_range, states, horizontal_mode, depth,
+                                day_cutoff, progress, partial_filter, trace, tag_level)
+        with self.lock:
+            self.results.put(key, token, result)
+        return result
+
+    def _find_ids(self, db, time_range, states, horizontal_mode, depth,
+                  day_cutoff, progress, partial_filter, trace, tag_level=0):
+        start_ms, end_ms = time_range
+
+        with trace.stage("index refresh") as entry:
+            index = self.index(db)
+            entry.update(index.last_stats)
+
+        if day_cutoff is not None:
+            # 1-3. Cached reviews: resolve only rows newer than the last search
+            progress("Scanning new reviews")
+            with trace.stage("seeds: review cache") as entry:
+                seed_uworld_ids = self.recent_qids(db, start_ms, end_ms, states, day_cutoff, index)
+                entry.update(self._review_cache.last_stats, direct_qids=len(seed_uworld_ids))
+        else:
+            # 1-3. Date range: per-day snapshots plus a bulk query for partial days
+            progress("Reading daily snapshots and scanning review log")
+            with trace.stage("seeds: snapshots + SQL") as entry:
+                seed_uworld_ids = self.range_qids(db, start_ms, end_ms, states, index)
+                entry.update(self.snapshots().last_stats, direct_qids=len(seed_uworld_ids))
+        if not seed_uworld_ids: return set(), set(), {}
+
+        # 4. Horizontal Expansion (in-memory BFS over the QID graph)
+        horizontal_ids = set()
+        hops = {}
+
+        if horizontal_mode and seed_uworld_ids:
+            # Partial results: direct IDs are final before the tree search runs
+            preview = partial_filter(seed_uworld_ids) if partial_filter else seed_uworld_ids
+            progress(f"Found {len(preview)} direct IDs. Loading QID graph", preview)
+            with trace.stage("graph load") as entry:
+                graph = self.graph(db, index)
+                entry.update(nodes=len(graph.nodes), edges=len(graph.neighbors))
+
+            layer_start = [time.perf_counter()]
+            def on_layer(layer, count):
+                now = time.perf_counter()
+                trace.add(f"tree layer {layer}", (now - layer_start[0]) * 1000, new_qids=count)
+                layer_start[0] = now
+                progress(f"Found {len(preview)} direct IDs. Tree search layer {layer}/{depth} ({count} new)")
+            with self.lock:
+                # A rebuild from another thread (prewarm, live session) closes the mapped arrays
+                hops = graph.expand(seed_uworld_ids, depth, on_layer)
+
+            if tag_level:
+                # Shared tag ancestor: trie walk over the indexed hierarchy
+                progress(f"Found {len(preview)} direct IDs. Matching tag level {tag_level}")
+                with trace.stage("tag trie") as entry:
+                    with self.lock:
+                        related, new = add_tag_relatives(index, seed_uworld_ids, hops, depth, tag_level)
+                        entry.update(related=related, new_qids=new, levels=index.trie.levels())
+            horizontal_ids.update(hops)
+
+        return seed_uworld_ids, horizontal_ids, hops
+
+# ============================================================
+# 3) FILTERING & MIXING
+# ============================================================
+def filter_set(id_set, invalid_ids, correct_ids=None):
+    # Candidates are probed against the filters' cached members; result is ascending
+    invalid = invalid_ids.members()
+    correct = correct_ids.members() if correct_ids is not None else frozenset()
+    return sorted(qid for qid in id_set if qid not in invalid and qid not in correct)
+
+def filter_stats(direct_ids, horizontal_ids, filtered_direct, filtered_horizontal, invalid_ids):
+    removed_invalid = len(invalid_ids.members().intersection(set(direct_ids).union(horizontal_ids)))
+    return {
+        'found': len(filtered_direct) + len(filtered_horizontal),
+        'removed_correct': (len(direct_ids) + len(horizontal_ids)) - (len(filtered_direct) + len(filtered_horizontal) + removed_invalid),
+        'removed_invalid': removed_invalid
+    }
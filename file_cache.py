@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+
+# ============================================================
+# MTIME-AWARE PARSED FILE CACHE
+# ============================================================
+class FileCache:
+    """Keeps parsed file contents in memory until the file's mtime or size changes.
+
+    Cached values are shared between callers, so treat them as read-only.
+    """
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.entries = {}  # path -> ((mtime_ns, size), value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, default):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.entries.pop(path, None)
+            return default
+        key = (st.st_mtime_ns, st.st_size)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        with open(path, "r", encoding="utf-8") as f:
+            value = self.parse(f.read())
+        self.entries[path] = (key, value)
+        return value
+
+    def put(self, path, value):
+        # After writing a file ourselves: remember it without re-reading
+        try:
+            st = os.stat(path)
+            self.entries[path] = ((st.st_mtime_ns, st.st_size), value)
+        except OSError:
+            self.entries.pop(path, None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "files": len(self.entries)}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import math
+
+DAY_MS = 86400000
+
+# Score = (1 + weighted terms) / (1 + hop). Each term is roughly 0..1.
+WEIGHTS = {
+    "lapses": 1.0,   # log-scaled lapse count of the worst card
+    "ease": 1.0,     # how far the lowest ease sits below 250%
+    "ivl": 0.5,      # short intervals are still shaky
+    "failed": 1.5,   # decays over FAIL_HALF_LIFE_DAYS since the last "Again"
+}
+FAIL_HALF_LIFE_DAYS = 7
+
+# One round trip per chunk: per-note worst card stats plus its latest failure
+# (the correlated subquery walks revlog's cid index, not the whole table)
+NOTE_STATS_SQL = """
+SELECT c.nid, max(c.lapses), min(CASE WHEN c.factor > 0 THEN c.factor END), min(max(c.ivl, 0)),
+       max((SELECT max(r.id) FROM revlog r WHERE r.cid = c.id AND r.ease = 1))
+FROM cards c WHERE c.nid IN ({}) GROUP BY c.nid
+"""
+
+# ============================================================
+# PRIORITY WEIGHTS
+# ============================================================
+def note_score(lapses, factor, ivl, last_fail, now_ms):
+    score = 1.0
+    score += WEIGHTS["lapses"] * min(1.0, math.log1p(lapses or 0) / math.log1p(8))
+    if factor:
+        score += WEIGHTS["ease"] * min(1.0, max(0.0, (2500 - factor) / 1200))
+    score += WEIGHTS["ivl"] / (1 + (ivl or 0) / 7)
+    if last_fail:
+        age_days = max(0, now_ms - last_fail) / DAY_MS
+        score += WEIGHTS["failed"] * 0.5 ** (age_days / FAIL_HALF_LIFE_DAYS)
+    return score
+
+def qid_weights(db, index, qids, hops, now_ms, chunk_size=5000):
+    """Returns {qid: weight > 0}. A QID takes the score of its weakest note,
+    discounted by its tree-search layer (direct QIDs are layer 0)."""
+    note_to_qids = {}
+    for qid in qids:
+        for nid in index.notes_for(qid):
+            note_to_qids.setdefault(nid, []).append(qid)
+
+    weights = dict.fromkeys(qids, 1.0)
+    nids = list(note_to_qids)
+    for i in range(0, len(nids), chunk_size):
+        chunk = ",".join(str(nid) for nid in nids[i:i + chunk_size])
+        for nid, lapses, factor, ivl, last_fail in db.all(NOTE_STATS_SQL.format(chunk)):
+            score = note_score(lapses, factor, ivl, last_fail, now_ms)
+            for qid in note_to_qids[nid]:
+                if score > weights[qid]: weights[qid] = score
+
+    for qid in weights:
+        weights[qid] /= 1 + hops.get(qid, 0)
+    return weights
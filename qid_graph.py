@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+
+# ============================================================
+# QID CO-OCCURRENCE GRAPH (CSR)
+# ============================================================
+class QidGraph:
+    """QID <-> QID adjacency for tree search, stored as compact int arrays.
+
+    ``nodes`` holds the sorted QIDs, and the neighbours of node ``i`` are
+    ``neighbors[offsets[i]:offsets[i + 1]]`` (node positions, not QIDs).
+    Two QIDs are adjacent when they are tagged on the same note. The arrays
+    are written next to the QID index and memory-mapped on the next load.
+    QIDs are stored as 64-bit ints: some tags carry timestamp-sized IDs.
+    """
+    VERSION = 2
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.nodes = array("q")
+        self.offsets = array("q", [0])
+        self.neighbors = array("i")
+        self.stamp = None
+        self._maps = []
+
+    # ---------- build / persist ----------
+    def build(self, index, stamp):
+        nodes = sorted(index.qid_notes)
+        pos = {q: i for i, q in enumerate(nodes)}
+        offsets = array("q", [0])
+        neighbors = array("i")
+        for qid in nodes:
+            linked = set()
+            for nid in index.notes_for(qid):
+                linked.update(index.qids_for(nid))
+            linked.discard(qid)
+            neighbors.extend(sorted(pos[q] for q in linked))
+            offsets.append(len(neighbors))
+
+        self.close()
+        self.nodes, self.offsets, self.neighbors = array("q", nodes), offsets, neighbors
+        self.stamp = stamp
+
+    def save(self):
+        try:
+            for ext, arr in self._arrays():
+                tmp_path = f"{self.base_path}.{ext}.tmp"
+                with open(tmp_path, "wb") as f:
+                    arr.tofile(f)
+                os.replace(tmp_path, f"{self.base_path}.{ext}")
+            # Meta goes last: a graph is only valid once its stamp is on disk
+            with open(self.base_path + ".json", "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "stamp": self.stamp, "nodes": len(self.nodes),
+                           "edges": len(self.neighbors)}, f)
+        except Exception as e:
+            print(f"Error saving QID graph: {e}")
+
+    def load(self):
+        meta_path = self.base_path + ".json"
+        if not os.path.exists(meta_path): return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != self.VERSION: return False  # rebuilt by the caller
+            views = {}
+            for ext, arr in self._arrays():
+                views[ext] = self._map(f"{self.base_path}.{ext}", arr.typecode)
+            if len(views["nodes"]) != meta["nodes"] or len(views["neighbors"]) != meta["edges"]:
+                raise ValueError("graph files out of sync")
+            self.nodes, self.offsets, self.neighbors = views["nodes"], views["offsets"], views["neighbors"]
+            self.stamp = meta["stamp"]
+            return True
+        except Exception as e:
+            print(f"Error loading QID graph: {e}")
+            self.close()
+            return False
+
+    def close(self):
+        # memoryviews must be released before their mmap can be closed
+        self.nodes, self.offsets, self.neighbors = array("q"), array("q", [0]), array("i")
+        for view, mm in self._maps:
+            try:
+                view.release()
+                mm.close()
+            except BufferError: pass  # still exported; freed with the last slice
+        self._maps = []
+
+    def _arrays(self):
+        return (("nodes", self.nodes), ("offsets", self.offsets), ("neighbors", self.neighbors))
+
+    def _map(self, path, typecode):
+        if os.path.getsize(path) == 0:
+            return array(typecode)
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm).cast(typecode)
+        self._maps.append((view, mm))
+        return view
+
+    # ---------- traversal ----------
+    def position(self, qid):
+        qid = int(qid)
+        i = bisect_left(self.nodes, qid)
+        if i < len(self.nodes) and self.nodes[i] == qid: return i
+        return -1
+
+    def expand(self, seed_qids, depth, on_layer=None):
+        """BFS from the seeds. Returns {QID: hop distance} for new QIDs only.
+
+        ``on_layer(layer, count)`` is called after each layer; it may raise to
+        abort the traversal.
+        """
+        seen = set()
+        for qid in seed_qids:
+            i = self.position(qid)
+            if i >= 0: seen.add(i)
+
+        hops = {}
+        frontier = list(seen)
+        for layer in range(1, depth + 1):
+            if not frontier: break
+            next_frontier = []
+            for i in frontier:
+                for j in self.neighbors[self.offsets[i]:self.offsets[i + 1]]:
+                    if j not in seen:
+                        seen.add(j)
+                        next_frontier.append(j)
+            for j in next_frontier:
+                hops[self.nodes[j]] = layer
+            frontier = next_frontier
+            if on_layer: on_layer(layer, len(next_frontier))
+        return hops
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import time
+from array import array
+
+from .tag_trie import TagTrie
+
+tag_regex = re.compile(r"(?i)UWorld.*::Step.*::(\d+)$")
+
+# tag_regex over many lowercased tags strings in one pass. Starting at the
+# literal "uworld" lets re skip non-UWorld tags at C speed; greedy \S* picks
+# the same trailing digits as tag_regex's .*
+bulk_qid_regex = re.compile(r"uworld\S*::step\S*::(\d+)(?!\S)")
+BULK_CHUNK = 2000
+
+def extract_qids(tags_str, out):
+    # notes.tags is a space separated string
+    for tag in tags_str.split():
+        match = tag_regex.search(tag)
+        if match: out.add(int(match.group(1)))
+
+def extract_uworld_tags(tags_str):
+    # Sorted tuple of the note's UWorld QID tags, hierarchy included.
+    # The substring checks skip the regex for the many non-UWorld tags.
+    if "uworld" not in tags_str.lower(): return ()
+    return tuple(sorted({tag for tag in tags_str.split()
+                         if "uworld" in tag.lower() and tag_regex.search(tag)}))
+
+def qid_array(tag_strings, chunk_size=BULK_CHUNK):
+    """QIDs tagged in any of the tags strings (repeats included), as
+    array("q"): one joined, lowercased string and one findall per chunk."""
+    out = array("q")
+    for i in range(0, len(tag_strings), chunk_size):
+        text = "\n".join(tag_strings[i:i + chunk_size]).lower()
+        out.extend(map(int, bulk_qid_regex.findall(text)))
+    return out
+
+# ============================================================
+# PERSISTENT QID <-> NOTE INDEX
+# ============================================================
+class QidIndex:
+    """On-disk map of UWorld QID -> note ids and note id -> QIDs.
+
+    Built once from the notes table, then kept current by re-reading only
+    notes whose ``mod`` is at or past the stored watermark, or whose ``usn``
+    is past the usn mark: sync keeps the remote ``mod``, which can be older
+    than local edits, but stamps every row it writes with a new ``usn``.
+    Deletions are applied through ``remove_notes`` (hook) and a prune pass
+    on first use, after each sync and after undo (``notes_changed``); the
+    prune pass also re-reads notes that came back with their old ``mod``
+    and ``usn``, e.g. a deletion that was undone.
+    The notes' full UWorld tags are kept too and mirrored into ``trie``.
+    """
+    VERSION = 4
+
+    def __init__(self, path):
+        self.path = path
+        self.note_tags = {}   # nid -> tuple of UWorld tags
+        self.note_qids = {}   # nid -> tuple of QIDs
+        self.qid_notes = {}   # QID -> set of nids
+        self.trie = TagTrie()
+        self.watermark = 0    # highest notes.mod already folded in
+        self.usn_mark = -1    # highest notes.usn already folded in (-1 = unsynced)
+        self.revision = 0     # bumped when any note's UWorld tags change (persisted)
+        self.qid_revision = 0  # bumped only when any note's QIDs change (persisted)
+        self.generation = int(time.time() * 1000)  # tells rebuilt indexes apart
+        self.pruned = False
+        self.known_nids = None  # every note id at the last prune pass (in memory)
+        self.unsaved = False  # note data changed since the last full save
+        self.marks_moved = False  # watermarks moved since the last save
+        self.last_stats = {}  # counts from the latest refresh (diagnostics)
+
+    @property
+    def qid_stamp(self):
+        # Changes exactly when the QID <-> note links do (graph cache key)
+        return f"{self.generation}:{self.qid_revision}"
+
+    def load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION: return
+            for nid, tags in data["notes"].items():
+                self._set(int(nid), tuple(tags))
+            self.watermark, self.usn_mark = data["watermark"], data["usn"]
+            self.revision, self.qid_revision = data["revision"], data["qid_revision"]
+            self.generation = data["generation"]
+            self._load_marks()
+        except Exception as e:
+            print(f"Error loading QID index: {e}")
+            self.note_tags, self.note_qids, self.qid_notes = {}, {}, {}
+            self.trie = TagTrie()
+            self.watermark = self.revision = self.qid_revision = 0
+            self.usn_mark = -1
+            self.generation = int(time.time() * 1000)
+
+    def _load_marks(self):
+        # Newer watermarks saved on their own; only valid for the same note data
+        if not os.path.exists(self.path + ".marks"): return
+        with open(self.path + ".marks", "r", encoding="utf-8") as f:
+            marks = json.load(f)
+        if (marks["generation"], marks["revision"]) == (self.generation, self.revision):
+            self.watermark, self.usn_mark = marks["watermark"], marks["usn"]
+
+    def save(self):
+        """Writes the notes only when they changed; moved watermarks alone go
+        to a small ``.marks`` file next to the index."""
+        marks = {"generation": self.generation, "revision": self.revision,
+                 "watermark": self.watermark, "usn": self.usn_mark}
+        if self.unsaved:
+            data = dict(marks, version=self.VERSION, qid_revision=self.qid_revision,
+                        notes={str(nid): list(tags) for nid, tags in self.note_tags.items()})
+            if self._write(self.path, data): self.unsaved = False
+        elif self.marks_moved:
+            self._write(self.path + ".marks", marks)
+        self.marks_moved = False
+
+    def _write(self, path, data):
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error saving QID index: {e}")
+            return False
+
+    def refresh(self, db):
+        """Fold in notes edited since the watermark. Returns True if anything
+        (notes or watermarks) needs saving."""
+        notes_changed = qids_changed = False
+        usn = db.scalar("SELECT max(usn) FROM notes")
+        usn = -1 if usn is None else usn
+        if usn < self.usn_mark:
+            # Collection replaced (full sync, restored backup): re-read everything
+            self.watermark, self.usn_mark, self.pruned = 0, -1, False
+        elif usn > self.usn_mark:
+            self.pruned = False  # a sync may also have deleted notes
+
+        rows = db.all(f"SELECT id, mod, usn, tags FROM notes "
+                      f"WHERE mod >= {int(self.watermark)} OR usn > {int(self.usn_mark)}")
+        self.last_stats = {"notes_read": len(rows)}
+        for nid, mod, note_usn, tags in rows:
+            uworld_tags = extract_uworld_tags(tags)
+            if self.note_tags.get(nid, ()) != uworld_tags:
+                qids_changed |= self._set(nid, uworld_tags)
+                notes_changed = True
+            if mod > self.watermark:
+                self.watermark = mod
+                self.marks_moved = True
+            if note_usn > self.usn_mark:
+                self.usn_mark = note_usn
+                self.marks_moved = True
+
+        # Notes deleted, or restored below both watermarks (undo), while the
+        # add-on wasn't watching (sync, undo, other tools)
+        if not self.pruned:
+            self.pruned = True
+            live = set(db.list("SELECT id FROM notes"))
+            gone = [nid for nid in self.note_tags if nid not in live]
+            if gone:
+                for nid in gone:
+                    qids_changed |= self._set(nid, ())
+                notes_changed = True
+            back = list(live - self.known_nids) if self.known_nids is not None else []
+            for i in range(0, len(back), 5000):
+                chunk = ",".join(str(nid) for nid in back[i:i + 5000])
+                for nid, tags in db.all(f"SELECT id, tags FROM notes WHERE id IN ({chunk})"):
+                    uworld_tags = extract_uworld_tags(tags)
+                    if self.note_tags.get(nid, ()) != uworld_tags:
+                        qids_changed |= self._set(nid, uworld_tags)
+                        notes_changed = True
+            self.known_nids = live
+
+        self._bump(notes_changed, qids_changed)
+        return self.unsaved or self.marks_moved
+
+    def notes_changed(self):
+        # Notes may have come back or gone without touching the watermarks
+        self.pruned = False
+
+    def remove_notes(self, nids):
+        if self.known_nids is not None: self.known_nids.difference_update(nids)
+        changed = [nid for nid in nids if nid in self.note_tags]
+        qids_changed = False
+        for nid in changed:
+            qids_changed |= self._set(nid, ())
+        self._bump(bool(changed), qids_changed)
+
+    def _bump(self, notes_changed, qids_changed):
+        if notes_changed:
+            self.revision += 1
+            self.unsaved = True
+        if qids_changed: self.qid_revision += 1
+
+    def _set(self, nid, tags):
+        """Replaces the note's UWorld tags; returns True if its QIDs changed."""
+        old_qids = self.note_qids.get(nid, ())
+        for tag in self.note_tags.pop(nid, ()):
+            self.trie.remove(tag, int(tag_regex.search(tag).group(1)))
+        for qid in self.note_qids.pop(nid, ()):
+            notes = self.qid_notes.get(qid)
+            if notes is not None:
+                notes.discard(nid)
+                if not notes: del self.qid_notes[qid]
+        qids = set()
+        if tags:
+            self.note_tags[nid] = tags
+            for tag in tags:
+                qid = int(tag_regex.search(tag).group(1))
+                self.trie.add(tag, qid)
+                qids.add(qid)
+            self.note_qids[nid] = tuple(sorted(qids))
+            for qid in qids:
+                self.qid_notes.setdefault(qid, set()).add(nid)
+        return tuple(sorted(qids)) != old_qids
+
+    def notes_for(self, qid):
+        return self.qid_notes.get(qid, ())
+
+    def qids_for(self, nid):
+        return self.note_qids.get(nid, ())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import re
+
+# QIDs below this live in the bitmap; anything larger (stray numbers pasted
+# from error dumps, odd tags) goes to a plain set so the bitmap stays small.
+BITMAP_LIMIT = 1 << 24
+
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+_DIGITS = re.compile(r"\d+")
+
+# ============================================================
+# COMPACT QID SET
+# ============================================================
+class QidSet:
+    """Set of integer QIDs backed by a Python int used as a bitmap.
+
+    Union, intersection and difference are single big-int operations and
+    iteration yields QIDs in ascending order, so no ``sort(key=int)`` is
+    needed. Convert to text only for display via ``to_text``. Probing many
+    candidates one at a time goes through ``members``, a frozenset built
+    once per set and kept until the set is mutated.
+    """
+    __slots__ = ("bits", "big", "_members")
+
+    def __init__(self, qids=()):
+        self.bits = 0
+        self.big = set()
+        self._members = None
+        self.update(qids)
+
+    @classmethod
+    def parse(cls, text):
+        # Any text with digit runs (pasted error dumps) -> QidSet
+        return cls(iter_qids(text))
+
+    @classmethod
+    def parse_list(cls, text):
+        # "1, 2,3" lists as saved by the blocklist and UWorld Helper -> QidSet
+        return cls(iter_listed_qids(text))
+
+    @classmethod
+    def _make(cls, bits, big):
+        new = cls.__new__(cls)
+        new.bits, new.big, new._members = bits, big, None
+        return new
+
+    # ---------- mutation ----------
+    def add(self, qid):
+        qid = int(qid)
+        self._members = None
+        if qid < BITMAP_LIMIT: self.bits |= 1 << qid
+        else: self.big.add(qid)
+
+    def update(self, qids):
+        self._members = None
+        if isinstance(qids, QidSet):
+            self.bits |= qids.bits
+            self.big |= qids.big
+            return
+        # Set bits in a bytearray first: one big-int build instead of one per QID
+        small = []
+        for qid in qids:
+            qid = int(qid)
+            if qid < BITMAP_LIMIT: small.append(qid)
+            else: self.big.add(qid)
+        if not small: return
+        buf = bytearray((max(small) >> 3) + 1)
+        for qid in small:
+            buf[qid >> 3] |= 1 << (qid & 7)
+        self.bits |= int.from_bytes(buf, "little")
+
+    def discard(self, qid):
+        qid = int(qid)
+        self._members = None
+        if qid < BITMAP_LIMIT: self.bits &= ~(1 << qid)
+        else: self.big.discard(qid)
+
+    # ---------- set algebra ----------
+    def __or__(self, other):
+        other = _coerce(other)
+        return self._make(self.bits | other.bits, self.big | other.big)
+
+    def __and__(self, other):
+        other = _coerce(other)
+        return self._make(self.bits & other.bits, self.big & other.big)
+
+    def __sub__(self, other):
+        other = _coerce(other)
+        return self._make(self.bits & ~other.bits, self.big - other.big)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, QidSet): return NotImplemented
+        return self.bits == other.bits and self.big == other.big
+
+    __hash__ = None
+
+    def copy(self):
+        return self._make(self.bits, set(self.big))
+
+    # ---------- queries ----------
+    def __contains__(self, qid):
+        qid = int(qid)
+        if qid < BITMAP_LIMIT: return bool(self.bits >> qid & 1)
+        return qid in self.big
+
+    def members(self):
+        # Hash lookups for per-candidate probes; shifting the big int is O(n)
+        if self._members is None:
+            self._members = frozenset(self)
+        return self._members
+
+    def __len__(self):
+        return bin(self.bits).count("1") + len(self.big)
+
+    def __bool__(self):
+        return bool(self.bits or self.big)
+
+    def __iter__(self):
+        if self.bits:
+            raw = self.bits.to_bytes((self.bits.bit_length() + 7) >> 3, "little")
+            for i, byte in enumerate(raw):
+                if byte:
+                    base = i << 3
+                    for bit in _BYTE_BITS[byte]:
+                        yield base + bit
+        yield from sorted(self.big)
+
+    def __repr__(self):
+        return f"QidSet({len(self)} QIDs)"
+
+    def to_text(self, sep=", "):
+        return sep.join(map(str, self))
+
+def iter_qids(text):
+    # Streams digit runs out of arbitrarily large text without a match list
+    for match in _DIGITS.finditer(text):
+        yield int(match.group())
+
+def iter_listed_qids(text):
+    # Comma separated entries; anything that isn't a plain number is skipped
+    for part in text.split(","):
+        part = part.strip()
+        if part.isdigit():
+            try: yield int(part)
+            except ValueError: pass  # digit-like characters such as "²"
+
+def _coerce(other):
+    return other if isinstance(other, QidSet) else QidSet(other)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left, bisect_right
+
+def card_state(queue, ivl):
+    if queue in (1, 3): return "learning"
+    if queue == 2: return "young" if ivl < 21 else "mature"
+    return None
+
+# ============================================================
+# INCREMENTAL REVIEW CACHE (revlog id -> cid -> QIDs)
+# ============================================================
+class ReviewCache:
+    """Resolved recent reviews for one profile.
+
+    Keeps the (revlog id, cid) rows seen so far and each card's current
+    state and note. A query only reads revlog rows past ``max_rid`` and
+    cards whose ``mod`` (or sync ``usn``) moved past the card watermarks;
+    note -> QID lookups go through the QID index, which tracks note edits
+    itself. Everything is dropped when the scheduler's day cutoff rolls
+    over, or when the revlog rows already covered changed (undone reviews,
+    rows synced in from another device). Cards in the queried window that
+    are wanted or unknown are re-read, so deleted cards drop out and cards
+    restored by undo (with their old ``mod``) come back.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.last_stats = {}  # counts from the latest query (diagnostics)
+        self.reset(None)
+
+    def reset(self, day_cutoff):
+        self.day_cutoff = day_cutoff
+        self.base_ms = None   # oldest revlog id covered
+        self.max_rid = 0      # highest revlog id processed
+        self.rids = []        # sorted revlog ids
+        self.cids = []        # card id for each entry in rids
+        self.cards = {}       # cid -> (state, nid)
+        self.card_mod = 0     # highest cards.mod already folded in
+        self.card_usn = -1    # highest cards.usn already folded in
+
+    def query(self, db, start_ms, end_ms, states, day_cutoff, index):
+        start_ms, end_ms = int(start_ms), int(end_ms)
+        if day_cutoff != self.day_cutoff or not self._revlog_matches(db):
+            self.reset(day_cutoff)
+            card_mod, card_usn = db.all("SELECT max(mod), max(usn) FROM cards")[0]
+            self.card_mod = card_mod or 0
+            self.card_usn = -1 if card_usn is None else card_usn
+
+        # 1. Extend coverage backwards if this window starts earlier
+        if self.base_ms is None:
+            self.max_rid = start_ms - 1
+            self.base_ms = start_ms
+        elif start_ms < self.base_ms:
+            rows = db.all(
+                f"SELECT id, cid FROM revlog WHERE id >= {start_ms} AND id < {self.base_ms} ORDER BY id")
+            self.rids[:0] = [r[0] for r in rows]
+            self.cids[:0] = [r[1] for r in rows]
+            self.base_ms = start_ms
+            self._resolve_cards(db, [r[1] for r in rows])
+
+        # 2. Only reviews newer than the watermark
+        rows = db.all(f"SELECT id, cid FROM revlog WHERE id > {self.max_rid} ORDER BY id")
+        new_reviews = len(rows)
+        if rows:
+            self.rids.extend(r[0] for r in rows)
+            self.cids.extend(r[1] for r in rows)
+            self.max_rid = rows[-1][0]
+            self._resolve_cards(db, [r[1] for r in rows])
+
+        # 3. Cards edited, rescheduled or reviewed since the last query
+        changed = db.all(
+            f"SELECT id, nid, queue, ivl, mod, usn FROM cards "
+            f"WHERE mod >= {int(self.card_mod)} OR usn > {int(self.card_usn)}")
+        for cid, nid, queue, ivl, mod, usn in changed:
+            if cid in self.cards:
+                self.cards[cid] = (card_state(queue, ivl), nid)
+            if mod > self.card_mod: self.card_mod = mod
+            if usn > self.card_usn: self.card_usn = usn
+
+        # 4. Window -> cards in a wanted state -> QIDs
+        lo = bisect_left(self.rids, start_ms)
+        hi = bisect_right(self.rids, end_ms)
+        wanted = {key for key, on in states.items() if on}
+        qids = set()
+        kept = 0
+        window_cids = set(self.cids[lo:hi])
+        self._recheck_cards(db, [cid for cid in window_cids
+                                 if self.cards.get(cid, (None,))[0] in wanted | {None}])
+        for cid in window_cids:
+            state, nid = self.cards.get(cid, (None, 0))
+            if state in wanted:
+                kept += 1
+                qids.update(index.qids_for(nid))
+        self.last_stats = {"new_reviews": new_reviews, "cards_changed": len(changed),
+                           "cards": len(window_cids), "cards_kept": kept}
+        return qids
+
+    def _revlog_matches(self, db):
+        # Rows deleted from (or inserted into) the covered id range change its count
+        if self.base_ms is None: return True
+        return len(self.rids) == db.scalar(
+            f"SELECT count() FROM revlog WHERE id >= {self.base_ms} AND id <= {self.max_rid}")
+
+    def _recheck_cards(self, db, cids):
+        # Current state of cards that may have been deleted or restored
+        for i in range(0, len(cids), 500):
+            chunk = cids[i:i + 500]
+            for cid in chunk:
+                self.cards[cid] = (None, 0)
+            for cid, nid, queue, ivl in db.all(
+                    f"SELECT id, nid, queue, ivl FROM cards WHERE id IN ({','.join(map(str, chunk))})"):
+                self.cards[cid] = (card_state(queue, ivl), nid)
+
+    def _resolve_cards(self, db, cids):
+        new_cids = [cid for cid in set(cids) if cid not in self.cards]
+        for i in range(0, len(new_cids), 500):
+            chunk = ",".join(str(cid) for cid in new_cids[i:i + 500])
+            for cid, nid, queue, ivl in db.all(
+                    f"SELECT id, nid, queue, ivl FROM cards WHERE id IN ({chunk})"):
+                self.cards[cid] = (card_state(queue, ivl), nid)
+        # Deleted cards: remember them so they aren't looked up again
+        for cid in new_cids:
+            self.cards.setdefault(cid, (None, 0))
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+import heapq
+import random
+from collections import deque
+
+# ============================================================
+# STREAMING SAMPLERS
+# ============================================================
+def draw(pool, k, start=0, rng=random):
+    """Partial Fisher-Yates: moves k random picks from pool[start:] into
+    pool[start:start+k] and returns them. Only k swaps, whatever len(pool)."""
+    end = min(len(pool), start + k)
+    for i in range(start, end):
+        j = rng.randrange(i, len(pool))
+        pool[i], pool[j] = pool[j], pool[i]
+    return pool[start:end]
+
+def shuffled(pool, start=0, rng=random):
+    # Lazily yields pool[start:] in random order, one swap per item pulled
+    for i in range(start, len(pool)):
+        j = rng.randrange(i, len(pool))
+        pool[i], pool[j] = pool[j], pool[i]
+        yield pool[i]
+
+def ordered(pool, start=0, key=None):
+    # Lazily yields pool[start:] in sorted order (sorts on first pull only)
+    if start >= len(pool): return
+    yield from sorted(pool, key=key)[start:] if key else pool[start:]
+
+# ============================================================
+# LAZY SELECTION (BLOCKS + OVERFLOW)
+# ============================================================
+class Selection:
+    """The active blocks (disjoint batches) followed by overflow that is
+    produced on demand.
+
+    Each block is its own list, so removing IDs only ever changes the
+    blocks that held them: they shrink, or with ``refill`` take the same
+    number of new candidates, and no QID moves between blocks. Candidates
+    listed through ``extend`` wait ahead of the undrawn overflow.
+    ``len()`` counts every remaining candidate. Removal leaves a tombstone
+    (None) found through a QID -> (block, position) dict; a block is
+    compacted once its tombstones outnumber its live entries.
+    """
+
+    def __init__(self, blocks=(), overflow=(), pools=()):
+        self.blocks = [list(block) for block in blocks] or [[]]  # None = removed
+        self._pos = {qid: (b, i) for b, block in enumerate(self.blocks)
+                     for i, qid in enumerate(block)}
+        self._dead = [0] * len(self.blocks)
+        self._reserve = deque()   # extended candidates not in a block yet
+        self._overflow = iter(overflow)
+        self._pools = pools       # lists holding every candidate, any order
+        self._members = None
+        self.removed = set()
+        self.total = sum(len(p) for p in pools) if pools else len(self._pos)
+
+    @property
+    def block_count(self):
+        return len(self.blocks)
+
+    def block(self, b):
+        return [qid for qid in self.blocks[b] if qid is not None]
+
+    def batch(self):
+        # Every block's live IDs, block after block
+        return [qid for block in self.blocks for qid in block if qid is not None]
+
+    def _append(self, b, qid):
+        self._pos[qid] = (b, len(self.blocks[b]))
+        self.blocks[b].append(qid)
+
+    def _next(self):
+        # Next unlisted candidate; removed QIDs are skipped as they come out
+        while self._reserve:
+            qid = self._reserve.popleft()
+            if qid not in self.removed: return qid
+        for qid in self._overflow:
+            if qid not in self.removed: return qid
+        return None
+
+    def _fill(self, b, n):
+        # Appends up to n new candidates to block b; returns how many
+        added = 0
+        while added < n:
+            qid = self._next()
+            if qid is None: break
+            self._append(b, qid)
+            added += 1
+        return added
+
+    def _compact(self, b):
+        self.blocks[b] = self.block(b)
+        for i, qid in enumerate(self.blocks[b]):
+            self._pos[qid] = (b, i)
+        self._dead[b] = 0
+
+    def _member_set(self):
+        if self._members is None:
+            self._members = set(self._pos)
+            for pool in self._pools: self._members.update(pool)
+        return self._members
+
+    def extend(self, qids, size):
+        """Lists new candidates: the last block takes them until it holds
+        ``size`` IDs, the rest wait ahead of any undrawn overflow. Known or
+        removed QIDs are skipped; returns how many were added."""
+        members = self._member_set()
+        added = 0
+        for qid in qids:
+            if qid in members: continue
+            members.add(qid)
+            self._reserve.append(qid)
+            added += 1
+        self.total += added
+        last = len(self.blocks) - 1
+        self._fill(last, size - (len(self.blocks[last]) - self._dead[last]))
+        return added
+
+    def discard(self, qids, refill=False):
+        """Removes qids wherever they are; with ``refill`` each block takes
+        as many new candidates as it lost. Returns how many were candidates."""
+        hits = self._member_set().intersection(qids) - self.removed
+        if not hits: return 0
+        self.removed |= hits
+        lost = [0] * len(self.blocks)
+        for qid in hits:
+            at = self._pos.pop(qid, None)
+            if at is not None:
+                b, i = at
+                self.blocks[b][i] = None
+                lost[b] += 1
+        self.total -= len(hits)
+        for b, n in enumerate(lost):
+            if not n: continue
+            self._dead[b] += n
+            if refill: self._fill(b, n)
+            if self._dead[b] * 2 > len(self.blocks[b]): self._compact(b)
+        return len(hits)
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        # The blocks, then every other candidate (drains the overflow)
+        yield from self.batch()
+        while True:
+            qid = self._next()
+            if qid is None: return
+            yield qid
+
+# ============================================================
+# BATCH MIXING (SMART FILL)
+# ============================================================
+def smart_fill(available_d, available_h, horizontal_mode, mix_percent, batch_size):
+    """Returns (direct, horizontal) counts for one batch."""
+    if not horizontal_mode:
+        # Pure Direct Mode
+        return min(available_d, batch_size), 0
+    # Targets, then Smart Fill: a short pool hands its slots to the other
+    target_h = int(batch_size * (mix_percent / 100))
+    target_d = batch_size - target_h
+    take_d = min(available_d, target_d)
+    take_h = min(available_h, target_h + (target_d - take_d))
+    if take_h < target_h:
+        take_d = min(available_d, target_d + (target_h - take_h))
+    return take_d, take_h
+
+def mix_batch(filtered_direct, filtered_horizontal, hops, horizontal_mode, depth,
+              mix_percent, batch_size, randomize, rng=random, weights=None, blocks=1):
+    """Draws the batch from ascending candidate lists without ordering the
+    whole pools. Returns a Selection: the active blocks, then overflow.
+
+    With ``weights`` ({qid: weight > 0}) each pool is ranked by weight:
+    the heaviest QIDs, or a weighted random sample when ``randomize`` is on.
+    With ``blocks`` > 1 the Selection holds that many disjoint batches of
+    ``batch_size``, each smart-filled from what the earlier ones left.
+    """
+    pool_d, pool_h = filtered_direct, filtered_horizontal
+    if not horizontal_mode: pool_h = []
+
+    # Per-block counts, then one draw of the total from each pool
+    takes = []
+    left_d, left_h = len(pool_d), len(pool_h)
+    for _ in range(blocks):
+        take_d, take_h = smart_fill(left_d, left_h, horizontal_mode, mix_percent, batch_size)
+        if not take_d + take_h: break
+        takes.append((take_d, take_h))
+        left_d, left_h = left_d - take_d, left_h - take_h
+    take_d, take_h = len(pool_d) - left_d, len(pool_h) - left_h
+
+    if weights is not None:
+        if randomize:
+            # Efraimidis-Spirakis: top-k of u ** (1 / w) is a weighted sample
+            # without replacement
+            keys = {x: rng.random() ** (1.0 / weights.get(x, 1.0)) for x in pool_d}
+            keys.update((x, rng.random() ** (1.0 / weights.get(x, 1.0))) for x in pool_h)
+        else:
+            keys = weights
+        rank_key = lambda x: (-keys.get(x, 0.0), x)
+        picked_d = heapq.nsmallest(take_d, pool_d, key=rank_key)
+        picked_h = heapq.nsmallest(take_h, pool_h, key=rank_key)
+
+        def overflow():
+            # Refill takes the next heaviest QID from either pool
+            yield from heapq.merge(ordered(pool_d, take_d, key=rank_key),
+                                   ordered(pool_h, take_h, key=rank_key), key=rank_key)
+    elif randomize:
+        picked_d = draw(pool_d, take_d, rng=rng)
+        picked_h = draw(pool_h, take_h, rng=rng)
+
+        def overflow():
+            # Leftovers sit at the tails after the partial shuffles
+            rest = pool_d[take_d:] + pool_h[take_h:]
+            yield from shuffled(rest, rng=rng)
+    else:
+        # Direct is already ascending; horizontal favours closer layers
+        hop_key = lambda x: (hops.get(x, depth), x)
+        picked_d = pool_d[:take_d]
+        picked_h = heapq.nsmallest(take_h, pool_h, key=hop_key)
+
+        def overflow():
+            yield from ordered(pool_d, take_d)
+            yield from ordered(pool_h, take_h, key=hop_key)
+
+    # Split the picks into blocks in draw/rank order
+    blocks = []
+    i_d = i_h = 0
+    for n_d, n_h in takes:
+        block = picked_d[i_d:i_d + n_d] + picked_h[i_h:i_h + n_h]
+        i_d, i_h = i_d + n_d, i_h + n_h
+        if randomize: rng.shuffle(block)
+        else: block.sort()
+        blocks.append(block)
+
+    return Selection(blocks, overflow(), (pool_d, pool_h))
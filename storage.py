@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from .file_cache import FileCache
+from .qidset import QidSet
+
+# ============================================================
+# FILE I/O HELPERS
+# ============================================================
+def get_local_data_dir():
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(addon_dir, "user_data")
+    if not os.path.exists(data_dir):
+        try: os.makedirs(data_dir)
+        except: pass
+    return data_dir
+
+# Parsed QID files stay in memory until their mtime/size changes.
+# Loaders return the shared cached QidSet: combine with |, - instead of mutating.
+qid_file_cache = FileCache(QidSet.parse_list)
+
+def load_correct_ids_from_helper(addons_dir=None):
+    try:
+        # Anki's addons21 folder is the parent of this add-on's folder
+        addons_dir = addons_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        target_path = os.path.join(addons_dir, "UWorld_Helper", "user_data", "correct_questions.txt")
+        return qid_file_cache.get(target_path, QidSet())
+    except: pass
+    return QidSet()
+
+# Blocklist = sorted snapshot (invalid_questions.txt) + append-only journal
+# of IDs blocked since the last compaction. Both use the same ", " format.
+JOURNAL_COMPACT_BYTES = 64 * 1024
+_blocklist_lock = threading.Lock()
+
+def get_invalid_paths():
+    data_dir = get_local_data_dir()
+    path = os.path.join(data_dir, "invalid_questions.txt")
+    return path, path + ".journal"
+
+def load_invalid_ids():
+    path, journal_path = get_invalid_paths()
+    try:
+        snapshot = qid_file_cache.get(path, QidSet())
+        journal = qid_file_cache.get(journal_path, QidSet())
+        return snapshot | journal if journal else snapshot
+    except: pass
+    return QidSet()
+
+def save_invalid_ids(new_bad_ids):
+    """Journal new IDs. Returns True once the journal is due for compaction."""
+    if not new_bad_ids: return False
+    path, journal_path = get_invalid_paths()
+    with _blocklist_lock:
+        added = QidSet(new_bad_ids) - load_invalid_ids()
+        if not added: return False
+        try:
+            journal = qid_file_cache.get(journal_path, QidSet())
+            # One appended line per save: O(new IDs), and a crash can only lose this line
+            with open(journal_path, "a", encoding="utf-8") as f:
+                f.write(added.to_text() + ",\n")
+                f.flush()
+                os.fsync(f.fileno())
+            qid_file_cache.put(journal_path, journal | added)
+            journal_size = os.path.getsize(journal_path)
+        except Exception as e:
+            print(f"Error saving invalid IDs: {e}")
+            return False
+    return journal_size >= JOURNAL_COMPACT_BYTES
+
+def compact_invalid_ids():
+    # Fold the journal into a freshly sorted snapshot, written atomically
+    path, journal_path = get_invalid_paths()
+    with _blocklist_lock:
+        if not os.path.exists(journal_path): return
+        try:
+            merged = load_invalid_ids()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(merged.to_text())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            qid_file_cache.put(path, merged)
+            # Crashing before this line only leaves IDs the snapshot already has
+            os.remove(journal_path)
+            qid_file_cache.put(journal_path, QidSet())
+        except Exception as e:
+            print(f"Error compacting invalid IDs: {e}")
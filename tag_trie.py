@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# ============================================================
+# UWORLD TAG HIERARCHY
+# ============================================================
+class _Node:
+    __slots__ = ("children", "qids")
+
+    def __init__(self):
+        self.children = {}  # lowercased tag segment -> _Node
+        self.qids = {}      # QID -> number of tags filed under this node
+
+class TagTrie:
+    """Trie of UWorld tag paths (``UWorld::Step1::Cardio::12345`` minus the
+    QID). Every node knows the QIDs in its subtree, so "QIDs sharing the
+    ancestor K levels above this one" is a walk, not a collection search.
+
+    Entries are reference counted: the same tag on several notes is added
+    once per note and stays until the last of them is removed.
+
+    The segments up to and including ``Step...`` (after the ``UWorld``
+    segment) name the whole question bank, so no level ever expands at or
+    above them: ``#AK_Step1_v12::#UWorld::Step::12345`` has no usable level.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.qid_paths = {}  # QID -> {path tuple: refs}
+
+    @staticmethod
+    def _path(tag):
+        return tuple(tag.lower().split("::")[:-1])
+
+    @staticmethod
+    def bank_depth(path):
+        """Leading segments of ``path`` that name the whole bank (through the
+        first ``step...`` segment after the ``uworld`` one)."""
+        uworld = next((i for i, segment in enumerate(path) if "uworld" in segment), -1)
+        step = next((i for i in range(uworld + 1, len(path)) if path[i].startswith("step")), uworld)
+        return step + 1
+
+    def add(self, tag, qid):
+        path = self._path(tag)
+        node = self.root
+        for segment in path:
+            node = node.children.setdefault(segment, _Node())
+            node.qids[qid] = node.qids.get(qid, 0) + 1
+        paths = self.qid_paths.setdefault(qid, {})
+        paths[path] = paths.get(path, 0) + 1
+
+    def remove(self, tag, qid):
+        path = self._path(tag)
+        paths = self.qid_paths.get(qid)
+        if not paths or path not in paths: return
+        paths[path] -= 1
+        if not paths[path]: del paths[path]
+        if not paths: del self.qid_paths[qid]
+
+        node, trail = self.root, []
+        for segment in path:
+            trail.append((node, segment))
+            node = node.children[segment]
+            node.qids[qid] -= 1
+            if not node.qids[qid]: del node.qids[qid]
+        # Prune branches that no longer hold any QID
+        for parent, segment in reversed(trail):
+            if parent.children[segment].qids: break
+            del parent.children[segment]
+
+    def node(self, path):
+        node = self.root
+        for segment in path:
+            node = node.children.get(segment)
+            if node is None: return None
+        return node
+
+    def levels(self):
+        # Deepest level any tag allows (0 = every tag stops at the bank)
+        return max((len(path) - self.bank_depth(path)
+                    for paths in self.qid_paths.values() for path in paths), default=0)
+
+    def related(self, seed_qids, level):
+        """QIDs filed under the ancestor ``level`` steps above each seed's
+        tags (1 = same parent tag, 2 = same grandparent, ...), never the
+        whole bank. Seeds excluded."""
+        found = set()
+        ancestors = set()
+        for qid in seed_qids:
+            for path in self.qid_paths.get(qid, ()):
+                if len(path) - level >= self.bank_depth(path):
+                    ancestors.add(path[:len(path) - level + 1])
+        for path in ancestors:
+            node = self.node(path)
+            if node is not None: found.update(node.qids)
+        found.difference_update(seed_qids)
+        return found
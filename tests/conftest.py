@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from ..benchmarks.synth import make_collection
+from ..engine import open_collection
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Factory for a writable synthetic collection: make_db(revlog_rows, notes, days)."""
+    opened = []
+
+    def make(revlog_rows=3000, notes=600, days=30):
+        path = make_collection(str(tmp_path / "collection.anki2"), revlog_rows, notes=notes, days=days)
+        opened.append(open_collection(path, readonly=False))
+        return opened[-1]
+
+    yield make
+    for db in opened:
+        db.close()
+
+@pytest.fixture
+def db(make_db):
+    return make_db()
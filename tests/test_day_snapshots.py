@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Day snapshots must match a fresh revlog scan after cards and notes are
+deleted, and must not rebuild days that an unrelated edit didn't touch."""
+import time
+
+from ..benchmarks.synth import DAY_MS
+from ..engine import SearchEngine, fetch_seed_tags
+from ..qid_index import qid_array
+
+ALL_STATES = {"learning": True, "young": True, "mature": True}
+
+def setup(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    today = int(time.time() * 1000) // DAY_MS
+    window = ((today - 10) * DAY_MS, today * DAY_MS - 1)
+    before = engine.range_qids(db, *window, ALL_STATES)
+    assert before == fresh(db, window)
+    return engine, window, before
+
+def fresh(db, window):
+    return set(qid_array(fetch_seed_tags(db, *window, ALL_STATES)))
+
+def test_deleted_cards_leave_snapshots(db, tmp_path):
+    engine, window, before = setup(db, tmp_path)
+    cids = db.list(f"SELECT DISTINCT cid FROM revlog WHERE id >= {window[0]} LIMIT 100")
+    db.conn.execute(f"DELETE FROM cards WHERE id IN ({','.join(map(str, cids))})")
+    db.conn.commit()
+    expected = fresh(db, window)
+    assert expected != before
+
+    restarted = SearchEngine(str(tmp_path), "test")
+    assert restarted.range_qids(db, *window, ALL_STATES) == expected
+    assert restarted.snapshots().last_stats["days_built"] == 0
+
+def test_deleted_notes_leave_snapshots(db, tmp_path):
+    engine, window, before = setup(db, tmp_path)
+    nids = db.list(
+        f"SELECT DISTINCT c.nid FROM revlog r JOIN cards c ON c.id = r.cid"
+        f" WHERE r.id >= {window[0]} LIMIT 50")
+    engine.notes_deleted(nids)
+    chunk = ",".join(map(str, nids))
+    db.conn.execute(f"DELETE FROM cards WHERE nid IN ({chunk})")
+    db.conn.execute(f"DELETE FROM notes WHERE id IN ({chunk})")
+    db.conn.commit()
+    expected = fresh(db, window)
+    assert expected != before
+    assert engine.range_qids(db, *window, ALL_STATES) == expected
+
+    engine.close()
+    restarted = SearchEngine(str(tmp_path), "test")
+    assert restarted.range_qids(db, *window, ALL_STATES) == expected
+
+def test_unrelated_review_keeps_snapshots_warm(db, tmp_path):
+    engine, window, before = setup(db, tmp_path)
+    # A review today: a new revlog row and a card touched with the newest mod
+    cid = db.scalar(f"SELECT cid FROM revlog WHERE id < {window[0]} LIMIT 1")
+    now = int(time.time())
+    db.conn.execute("INSERT INTO revlog (id, cid, usn, ease, ivl, lastIvl, factor, time, type)"
+                    " VALUES (?, ?, -1, 3, 1, 1, 2500, 5000, 1)", (now * 1000, cid))
+    db.conn.execute("UPDATE cards SET mod = ?, usn = -1 WHERE id = ?", (now, cid))
+    db.conn.commit()
+    for _ in range(2):
+        assert engine.range_qids(db, *window, ALL_STATES) == before
+        assert engine.snapshots().last_stats["days_built"] == 0
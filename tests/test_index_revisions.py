@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Edits that leave every note's QIDs alone must not rebuild the QID graph
+or rewrite the saved index."""
+import os
+import time
+
+from ..engine import SearchEngine
+
+def edit_note(db, nid, tags):
+    db.conn.execute("UPDATE notes SET tags = ?, mod = ? WHERE id = ?", (tags, int(time.time()) + 60, nid))
+    db.conn.commit()
+
+def test_plain_note_edit_keeps_graph_and_index_file(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    graph = engine.graph(db)
+    stamp = graph.stamp
+    index_path = engine.index(db).path
+    index_mtime = os.stat(index_path).st_mtime_ns
+
+    nid = db.scalar("SELECT id FROM notes WHERE tags NOT LIKE '%UWorld%' LIMIT 1")
+    edit_note(db, nid, " marked ")
+    assert engine.graph(db) is graph and graph.stamp == stamp
+    assert os.stat(index_path).st_mtime_ns == index_mtime
+
+    # The moved watermark still survives a restart, without a full re-read
+    restarted = SearchEngine(str(tmp_path), "test")
+    assert restarted.index(db).last_stats["notes_read"] == 1
+    assert restarted.graph(db).stamp == stamp
+
+def test_qid_edit_rebuilds_graph(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    stamp = engine.graph(db).stamp
+
+    nid = db.scalar("SELECT id FROM notes WHERE tags LIKE '%UWorld%' LIMIT 1")
+    edit_note(db, nid, " UWorld::Step1::99999 UWorld::Step1::99998 ")
+    graph = engine.graph(db)
+    assert graph.stamp != stamp
+    assert graph.expand([99999], 1) == {99998: 1}
+
+def test_undo_restored_note_comes_back(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    now_ms = int(time.time() * 1000)
+    window = (now_ms - 3 * 86400 * 1000, now_ms)
+    states = {"learning": True, "young": True, "mature": True}
+    before = engine.recent_qids(db, *window, states, 1)
+    nid = db.scalar(
+        f"SELECT c.nid FROM revlog r JOIN cards c ON c.id = r.cid JOIN notes n ON n.id = c.nid"
+        f" WHERE r.id >= {window[0]} AND c.queue IN (1, 2, 3) AND n.tags LIKE '%UWorld%' LIMIT 1")
+    qids = engine.index(db).qids_for(nid)
+    note = db.all("SELECT * FROM notes WHERE id = ?", nid)
+    cards = db.all("SELECT * FROM cards WHERE nid = ?", nid)
+
+    engine.notes_deleted([nid])
+    db.conn.execute("DELETE FROM cards WHERE nid = ?", (nid,))
+    db.conn.execute("DELETE FROM notes WHERE id = ?", (nid,))
+    db.conn.commit()
+    engine.recent_qids(db, *window, states, 1)
+    assert engine.index(db).qids_for(nid) == ()
+
+    # Undo puts the rows back unchanged: old mod, old usn
+    db.conn.executemany(f"INSERT INTO notes VALUES ({','.join('?' * len(note[0]))})", note)
+    db.conn.executemany(f"INSERT INTO cards VALUES ({','.join('?' * len(cards[0]))})", cards)
+    db.conn.commit()
+    engine.notes_changed()
+    assert engine.recent_qids(db, *window, states, 1) == before
+    assert engine.index(db).qids_for(nid) == qids
+    assert set(qids) <= set(engine.graph(db).nodes)
+
+def test_graph_holds_64_bit_qids(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    engine.graph(db)
+    nid = db.scalar("SELECT id FROM notes WHERE tags LIKE '%UWorld%' LIMIT 1")
+    edit_note(db, nid, " UWorld::Step1::20240101123456 UWorld::Step1::99998 ")
+    assert engine.graph(db).expand([20240101123456], 1) == {99998: 1}
+
+    restarted = SearchEngine(str(tmp_path), "test")
+    assert restarted.graph(db).expand([99998], 1) == {20240101123456: 1}
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Saved QID lists parse as comma separated numbers, and filtering keeps
+ascending order with the filters' cached members."""
+from ..engine import filter_set
+from ..qidset import QidSet
+
+def test_parse_list_keeps_plain_numbers_only():
+    text = "1, 2,3,\n4, 5a, b6, ²,  7 ,,20240101123456,\n"
+    assert list(QidSet.parse_list(text)) == [1, 2, 3, 4, 7, 20240101123456]
+
+def test_filter_set_tracks_mutated_filters():
+    invalid = QidSet([2, 4])
+    assert filter_set({5, 4, 3, 2, 1}, invalid, QidSet([1])) == [3, 5]
+    invalid.add(5)
+    assert filter_set({5, 4, 3, 2, 1}, invalid) == [1, 3]
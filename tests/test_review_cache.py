@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""The incremental review cache must match a fresh scan after reviews are
+undone and cards are deleted."""
+import time
+
+from ..benchmarks.synth import DAY_MS
+from ..qid_index import QidIndex
+from ..review_cache import ReviewCache
+
+ALL_STATES = {"learning": True, "young": True, "mature": True}
+DAY_CUTOFF = 1  # any value; it only has to stay the same between queries
+
+def setup(make_db):
+    db = make_db(20000, notes=2000)
+    index = QidIndex(None)
+    index.refresh(db)
+    now_ms = int(time.time() * 1000)
+    return db, index, (now_ms - 3 * DAY_MS, now_ms)
+
+def fresh(db, index, window):
+    return ReviewCache("test").query(db, *window, ALL_STATES, DAY_CUTOFF, index)
+
+def test_undone_reviews_leave_the_cache(make_db):
+    db, index, window = setup(make_db)
+    cache = ReviewCache("test")
+    assert cache.query(db, *window, ALL_STATES, DAY_CUTOFF, index) == fresh(db, index, window)
+
+    # Cards reviewed exactly once in the window: undoing that review drops their QIDs
+    single = db.list(
+        f"SELECT cid FROM revlog WHERE id >= {window[0]} GROUP BY cid HAVING count() = 1 LIMIT 20")
+    db.conn.execute(f"DELETE FROM revlog WHERE id >= {window[0]} AND cid IN ({','.join(map(str, single))})")
+    db.conn.commit()
+    expected = fresh(db, index, window)
+    assert cache.query(db, *window, ALL_STATES, DAY_CUTOFF, index) == expected
+
+def test_deleted_cards_leave_the_cache(make_db):
+    db, index, window = setup(make_db)
+    cache = ReviewCache("test")
+    before = cache.query(db, *window, ALL_STATES, DAY_CUTOFF, index)
+
+    cids = db.list(f"SELECT DISTINCT cid FROM revlog WHERE id >= {window[0]} LIMIT 50")
+    db.conn.execute(f"DELETE FROM cards WHERE id IN ({','.join(map(str, cids))})")
+    db.conn.commit()
+    expected = fresh(db, index, window)
+    assert expected != before
+    assert cache.query(db, *window, ALL_STATES, DAY_CUTOFF, index) == expected
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Blocks stay disjoint and stable while IDs are removed."""
+import random
+
+from ..selection import Selection, mix_batch
+
+def three_blocks(randomize=True):
+    direct, horizontal = list(range(1, 41)), list(range(100, 160))
+    hops = dict.fromkeys(horizontal, 1)
+    return mix_batch(direct, horizontal, hops, True, 1, 50, 10, randomize,
+                     rng=random.Random(0), blocks=3)
+
+def test_removal_only_shrinks_the_block_that_held_the_ids():
+    selection = three_blocks()
+    before = [selection.block(b) for b in range(3)]
+    gone = before[0][:3]
+    assert selection.discard(gone) == 3
+    assert selection.block(0) == before[0][3:]
+    assert [selection.block(1), selection.block(2)] == before[1:]
+
+def test_refill_tops_up_only_the_block_that_lost_ids():
+    selection = three_blocks(randomize=False)
+    before = [selection.block(b) for b in range(3)]
+    gone = set(before[1][:2] + before[1][-1:])
+    selection.discard(gone, refill=True)
+    block = selection.block(1)
+    assert len(block) == 10 and not gone & set(block)
+    assert [selection.block(0), selection.block(2)] == [before[0], before[2]]
+    assert len(set(selection.batch())) == 30
+    assert len(selection) == 97
+
+def test_extend_fills_the_last_block_then_waits():
+    selection = Selection()
+    assert selection.extend([5, 6, 7], 2) == 3
+    assert selection.batch() == [5, 6]
+    selection.discard([5], refill=True)
+    assert selection.batch() == [6, 7]
+    assert list(selection) == [6, 7]
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Rows written by sync keep the remote ``mod``, which can be older than
+anything edited locally; they must still reach the QID index and snapshots.
+
+Run from Anki's addons21 folder: python -m pytest "<addon folder>/tests"
+"""
+import time
+
+from ..benchmarks.synth import DAY_MS
+from ..engine import SearchEngine, fetch_seed_tags
+from ..qid_index import QidIndex, qid_array
+
+ALL_STATES = {"learning": True, "young": True, "mature": True}
+NEW_QID = 99999
+
+def sync_note_tags(db, nid, tags):
+    # What a sync does to a note edited on another device before the last local edit
+    usn = db.scalar("SELECT max(usn) FROM notes") + 1
+    db.conn.execute("UPDATE notes SET tags = ?, mod = 1, usn = ? WHERE id = ?", (tags, usn, nid))
+    db.conn.commit()
+
+def reviewed_note(db, day):
+    # A UWorld-tagged note with a review on ``day`` (a closed day)
+    return db.scalar(
+        "SELECT c.nid FROM revlog r JOIN cards c ON c.id = r.cid JOIN notes n ON n.id = c.nid"
+        f" WHERE r.id >= {day * DAY_MS} AND r.id < {(day + 1) * DAY_MS}"
+        " AND c.queue IN (1, 2, 3) AND n.tags LIKE '%UWorld%' LIMIT 1")
+
+def test_index_rereads_synced_notes(db, tmp_path):
+    index = QidIndex(str(tmp_path / "qid_index.json"))
+    index.refresh(db)
+    index.save()
+    nid = db.scalar("SELECT id FROM notes WHERE tags LIKE '%UWorld%' LIMIT 1")
+    assert index.qids_for(nid) and NEW_QID not in index.qids_for(nid)
+
+    sync_note_tags(db, nid, f" UWorld::Step1::{NEW_QID} ")
+    reloaded = QidIndex(index.path)
+    reloaded.load()
+    assert reloaded.refresh(db)
+    assert reloaded.qids_for(nid) == (NEW_QID,)
+    assert reloaded.notes_for(NEW_QID) == {nid}
+
+def test_index_rebuilds_when_usn_drops(db):
+    # A full sync or restored backup can leave every usn below the stored mark
+    index = QidIndex(None)
+    index.usn_mark = 50
+    index.watermark = int(time.time()) + 86400
+    index.refresh(db)
+    assert index.last_stats["notes_read"] == db.scalar("SELECT count() FROM notes")
+
+def test_snapshots_follow_synced_notes(db, tmp_path):
+    engine = SearchEngine(str(tmp_path), "test")
+    day = int(time.time() * 1000) // DAY_MS - 10
+    window = (day * DAY_MS, (day + 1) * DAY_MS - 1)
+    nid = reviewed_note(db, day)
+    before = engine.range_qids(db, *window, ALL_STATES)
+    assert set(engine.snapshots().days) == {day}
+    assert NEW_QID not in before
+
+    sync_note_tags(db, nid, f" UWorld::Step1::{NEW_QID} ")
+    engine = SearchEngine(str(tmp_path), "test")  # fresh process, state from disk
+    after = engine.range_qids(db, *window, ALL_STATES)
+    assert NEW_QID in after
+    assert after == set(qid_array(fetch_seed_tags(db, *window, ALL_STATES)))
+    assert engine.snapshots().last_stats["days_built"] == 0
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Tag levels stop below the UWorld::Step bank."""
+from ..tag_trie import TagTrie
+
+def trie(*tags):
+    t = TagTrie()
+    for tag in tags:
+        t.add(tag, int(tag.rsplit("::", 1)[1]))
+    return t
+
+def test_anking_tags_have_no_levels():
+    t = trie("#AK_Step1_v12::#UWorld::Step::1", "#AK_Step1_v12::#UWorld::Step::2")
+    assert t.levels() == 0
+    assert t.related({1}, 1) == set()
+
+def test_levels_below_step():
+    t = trie("UWorld::Step1::Cardio::Arrhythmia::1", "UWorld::Step1::Cardio::Arrhythmia::2",
+             "UWorld::Step1::Cardio::Valves::3", "UWorld::Step1::Renal::4")
+    assert t.levels() == 2
+    assert t.related({1}, 1) == {2}
+    assert t.related({1}, 2) == {2, 3}
+    assert t.related({1}, 3) == set()
+    assert t.related({4}, 1) == set()
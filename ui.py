@@ -0,0 +1,685 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import re
+import threading
+from datetime import datetime
+from aqt import mw
+from aqt.qt import *
+from aqt.operations import QueryOp
+from aqt.utils import showText, tooltip
+
+from .diagnostics import CountingDB, SearchTrace
+from .engine import SearchCancelled, SearchEngine, filter_set, filter_stats
+from .qid_index import extract_qids
+from .qidset import QidSet, iter_qids
+from .review_cache import card_state
+from .selection import Selection, mix_batch
+from .storage import (
+    compact_invalid_ids, get_local_data_dir, load_correct_ids_from_helper,
+    load_invalid_ids, save_invalid_ids, qid_file_cache,
+)
+
+# Global reference to keep the window alive (Modeless)
+history_window = None
+
+# ============================================================
+# 1) ENGINE & BACKGROUND WORK
+# ============================================================
+_engine = None
+
+def profile_key():
+    return re.sub(r"[^\w.-]", "_", mw.pm.name or "default")
+
+def get_engine():
+    global _engine
+    profile = profile_key()
+    if _engine is None or _engine.profile != profile:
+        if _engine is not None: _engine.close()
+        _engine = SearchEngine(get_local_data_dir(), profile)
+    return _engine
+
+def start_prewarm():
+    # Low priority, after profile load: blocklist and correct sets, QID index
+    # and graph, today's reviews; then the snapshot backfill continues
+    if not mw.col: return
+    engine = get_engine()
+    addons_dir = mw.addonManager.addonsFolder()
+
+    def op(col):
+        load_invalid_ids()
+        load_correct_ids_from_helper(addons_dir)
+        index = engine.index(col.db)
+        engine.graph(col.db, index)
+        day_cutoff = col.sched.day_cutoff
+        states = {"learning": True, "young": True, "mature": True}
+        engine.recent_qids(col.db, (day_cutoff - 86400) * 1000, time.time() * 1000,
+                           states, day_cutoff, index)
+
+    QueryOp(parent=mw, op=op, success=lambda _: start_snapshot_backfill()).failure(
+        lambda e: print(f"Prewarm failed: {e}")).run_in_background()
+
+def start_snapshot_backfill():
+    # Low priority: one short collection op per chunk of history
+    if not mw.col: return
+    engine = get_engine()
+
+    def on_done(remaining):
+        if remaining: mw.progress.single_shot(2000, start_snapshot_backfill)
+
+    QueryOp(parent=mw, op=lambda col: engine.backfill_snapshots(col.db), success=on_done).failure(
+        lambda e: print(f"Snapshot backfill failed: {e}")).run_in_background()
+
+def record_invalid_ids(bad_ids):
+    # Journal append (and compaction when due) off the main thread
+    def task():
+        if save_invalid_ids(bad_ids): compact_invalid_ids()
+    mw.taskman.run_in_background(task)
+
+def on_notes_deleted(col, ids):
+    if _engine is not None:
+        _engine.notes_deleted(ids)
+
+def on_notes_changed():
+    if _engine is not None:
+        _engine.notes_changed()
+
+def on_card_answered(reviewer, card, ease):
+    if history_window is not None and history_window.chk_live.isChecked():
+        history_window.add_reviewed_card(card.id)
+
+# ============================================================
+# 2) THE UNIFIED DASHBOARD WINDOW
+# ============================================================
+class UWorldHistoryFetcher(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Get UWorld IDs from History")
+        self.setMinimumSize(580, 780)
+        
+        # State Data
+        self.all_found_ids = Selection()  # Blocks followed by lazily drawn overflow
+        self.displayed_ids = []  # Stores just the blocks currently shown
+        self.horizontal_hops = {}  # Horizontal QID -> tree search layer
+        self.search_cancel = None  # threading.Event while a search runs
+        
+        self.initUI()
+
+    def initUI(self):
+        main_layout = QVBoxLayout()
+
+        # --- SECTION 1: SETTINGS ---
+        settings_group = QGroupBox("Search Settings")
+        settings_layout = QVBoxLayout()
+        
+        # 1. Timeframe Selection
+        time_group_layout = QVBoxLayout()
+        
+        # Option A: Today
+        self.radio_today = QRadioButton("Reviewed Today")
+        self.radio_today.setChecked(True)
+        time_group_layout.addWidget(self.radio_today)
+        
+        # Option B: Last X Hours
+        hbox_hours = QHBoxLayout()
+        self.radio_hours = QRadioButton("Last:")
+        self.spin_hours = QSpinBox()
+        self.spin_hours.setRange(1, 1000)
+        self.spin_hours.setValue(4)
+        self.spin_hours.setSuffix(" hours")
+        hbox_hours.addWidget(self.radio_hours)
+        hbox_hours.addWidget(self.spin_hours)
+        hbox_hours.addStretch()
+        time_group_layout.addLayout(hbox_hours)
+        
+        # Option C: Date Range
+        hbox_range = QHBoxLayout()
+        self.radio_range = QRadioButton("Between:")
+        
+        self.dt_start = QDateTimeEdit(QDateTime.currentDateTime().addDays(-1))
+        self.dt_start.setCalendarPopup(True)
+        self.dt_start.setDisplayFormat("MM/dd HH:mm")
+        
+        self.dt_end = QDateTimeEdit(QDateTime.currentDateTime())
+        self.dt_end.setCalendarPopup(True)
+        self.dt_end.setDisplayFormat("MM/dd HH:mm")
+        
+        hbox_range.addWidget(self.radio_range)
+        hbox_range.addWidget(self.dt_start)
+        hbox_range.addWidget(QLabel("to"))
+        hbox_range.addWidget(self.dt_end)
+        hbox_range.addStretch()
+        time_group_layout.addLayout(hbox_range)
+        
+        settings_layout.addLayout(time_group_layout)
+        
+        # Divider line
+        line = QFrame()
+        line.setFrameShape(QFrame.Shape.HLine)
+        line.setFrameShadow(QFrame.Shadow.Sunken)
+        settings_layout.addWidget(line)
+        
+        # 2. Card States (Grid)
+        checks_layout = QGridLayout()
+        self.chk_learning = QCheckBox("Learning")
+        self.chk_learning.setChecked(True)
+        self.chk_young = QCheckBox("Young")
+        self.chk_young.setChecked(True)
+        self.chk_mature = QCheckBox("Mature")
+        self.chk_mature.setChecked(True)
+        
+        checks_layout.addWidget(self.chk_learning, 0, 0)
+        checks_layout.addWidget(self.chk_young, 0, 1)
+        checks_layout.addWidget(self.chk_mature, 0, 2)
+        
+        settings_layout.addLayout(checks_layout)
+
+        # 3. Horizontal Search & Mixing
+        h_search_group = QGroupBox("Horizontal Search (Tree Search)")
+        h_search_layout = QGridLayout()
+        
+        self.chk_horizontal = QCheckBox("Enable Tree Search")
+        self.chk_horizontal.setToolTip(
+            "Finds cards related to your reviews by shared UWorld tags.\n"
+            "Enable to broaden your search to related concepts."
+        )
+        self.chk_horizontal.stateChanged.connect(self.toggle_horizontal_controls)
+        
+        # Layers Control
+        self.lbl_depth = QLabel("Layers:")
+        self.spin_depth = QSpinBox()
+        self.spin_depth.setRange(1, 5)
+        self.spin_depth.setValue(1)
+        self.spin_depth.setToolTip("Degrees of Separation (1 = Friends, 2 = Friends of Friends)")
+        
+        # Mix Percentage
+        self.lbl_mix = QLabel("Batch Share:")
+        self.spin_mix = QSpinBox()
+        self.spin_mix.setRange(0, 100)
+        self.spin_mix.setValue(50)
+        self.spin_mix.setSuffix("%")
+        self.spin_mix.setToolTip(
+            "Percentage of the final batch allocated to Horizontal/Related questions.\n"
+            "Example: 50% means half your test will be direct history, half will be related."
+        )
+        
+        # Shared tag ancestor (UWorld tag hierarchy)
+        self.lbl_tag_level = QLabel("Tag Level:")
+        self.spin_tag_level = QSpinBox()
+        self.spin_tag_level.setRange(0, 6)
+        self.spin_tag_level.setValue(0)
+        self.spin_tag_level.setSpecialValueText("Off")
+        self.spin_tag_level.setToolTip(
+            "Also include questions filed under the same UWorld tag as your reviews.\n"
+            "1 = the tag right above the QID, 2 = the one above that, ... but never the whole\n"
+            "UWorld::Step bank. Only works if your UWorld tags go deeper than Step\n"
+            "(e.g. UWorld::Step1::Cardiology::Arrhythmias::12345); tags like\n"
+            "#AK_Step1_v12::#UWorld::Step::12345 have no levels to use."
+        )
+
+        h_search_layout.addWidget(self.chk_horizontal, 0, 0, 1, 2)
+        h_search_layout.addWidget(self.lbl_depth, 1, 0)
+        h_search_layout.addWidget(self.spin_depth, 1, 1)
+        h_search_layout.addWidget(self.lbl_mix, 1, 2)
+        h_search_layout.addWidget(self.spin_mix, 1, 3)
+        h_search_layout.addWidget(self.lbl_tag_level, 2, 0)
+        h_search_layout.addWidget(self.spin_tag_level, 2, 1)
+        
+        h_search_group.setLayout(h_search_layout)
+        settings_layout.addWidget(h_search_group)
+
+        # 4. Final Output Settings
+        out_layout = QGridLayout()
+        
+        # Row 0: Batch Size & Randomize
+        out_layout.addWidget(QLabel("Batch Size:"), 0, 0)
+        self.spin_limit = QSpinBox()
+        self.spin_limit.setRange(1, 1000)
+        self.spin_limit.setValue(40) 
+        out_layout.addWidget(self.spin_limit, 0, 1)
+
+        self.chk_randomize = QCheckBox("Randomize Order")
+        self.chk_randomize.setChecked(True)
+        self.chk_randomize.setToolTip("Shuffle history and horizontal questions together.")
+        out_layout.addWidget(self.chk_randomize, 0, 2)
+        
+        # Row 1: Refill & Include Correct
+        self.chk_refill = QCheckBox("Refill after filtering")
+        self.chk_refill.setChecked(False) # [CHANGED] Default to Unchecked
+        self.chk_refill.setToolTip(
+            "If Checked: Automatically adds new questions to replace invalid ones you remove.\n"
+            "If Unchecked: Removing invalid questions reduces the list size."
+        )
+        out_layout.addWidget(self.chk_refill, 1, 0, 1, 2) 
+
+        self.chk_include_correct = QCheckBox("Include Correct")
+        self.chk_include_correct.setToolTip("Include questions you already mastered in UWorld Helper.")
+        out_layout.addWidget(self.chk_include_correct, 1, 2)
+
+        # Row 2: Priority weighting
+        self.chk_priority = QCheckBox("Prioritize weak questions")
+        self.chk_priority.setToolTip(
+            "Weights each question by its cards' lapses, ease, interval and recent failures\n"
+            "(and tree search layer). With Randomize Order on, the batch is a weighted random\n"
+            "draw; with it off, the highest-weighted questions are picked."
+        )
+        out_layout.addWidget(self.chk_priority, 2, 0, 1, 2)
+
+        self.chk_live = QCheckBox("Live Session")
+        self.chk_live.setToolTip(
+            "While checked, every card you answer adds its UWorld IDs to the list\n"
+            "(filtered like a normal search). With Tree Search enabled, their\n"
+            "first-layer related questions are added too."
+        )
+        out_layout.addWidget(self.chk_live, 2, 2)
+
+        # Row 3: Multiple test blocks
+        out_layout.addWidget(QLabel("Blocks:"), 3, 0)
+        self.spin_blocks = QSpinBox()
+        self.spin_blocks.setRange(1, 10)
+        self.spin_blocks.setValue(1)
+        self.spin_blocks.setToolTip(
+            "Number of separate tests to build from one search.\n"
+            "Each block has Batch Size questions with the same Batch Share, and no ID repeats across blocks."
+        )
+        out_layout.addWidget(self.spin_blocks, 3, 1)
+        
+        settings_layout.addLayout(out_layout)
+        
+        settings_group.setLayout(settings_layout)
+        main_layout.addWidget(settings_group)
+
+        # --- SECTION 2: ACTION BUTTON ---
+        self.btn_generate = QPushButton("Generate Question List")
+        self.btn_generate.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_generate.setStyleSheet("font-weight: bold; padding: 8px; font-size: 14px;")
+        self.btn_generate.clicked.connect(self.run_search)
+
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.clicked.connect(self.cancel_search)
+        self.btn_cancel.setVisible(False)
+
+        action_hbox = QHBoxLayout()
+        action_hbox.addWidget(self.btn_generate, 1)
+        action_hbox.addWidget(self.btn_cancel)
+        main_layout.addLayout(action_hbox)
+
+        # --- SECTION 3: OUTPUT ---
+        self.lbl_status = QLabel("Ready to search.")
+        self.lbl_status.setStyleSheet("color: gray; font-style: italic; margin-top: 5px;")
+        main_layout.addWidget(self.lbl_status)
+
+        self.tab_blocks = QTabBar()
+        self.tab_blocks.currentChanged.connect(lambda index: self.show_block())
+        self.tab_blocks.setVisible(False)
+        main_layout.addWidget(self.tab_blocks)
+
+        self.text_area = QTextEdit()
+        self.text_area.setPlaceholderText("Questions will appear here...")
+        main_layout.addWidget(self.text_area)
+
+        # --- SECTION 4: FILTERING ---
+        filter_hbox = QHBoxLayout()
+        self.btn_filter = QPushButton("Remove Bad IDs from Error...")
+        self.btn_filter.clicked.connect(self.open_filter_dialog)
+        self.btn_filter.setToolTip("Paste a UWorld error message here to permanently block those IDs.")
+        
+        self.btn_copy = QPushButton("Copy to Clipboard")
+        self.btn_copy.clicked.connect(self.copy_to_clipboard)
+        
+        filter_hbox.addWidget(self.btn_filter)
+        filter_hbox.addStretch()
+        filter_hbox.addWidget(self.btn_copy)
+        main_layout.addLayout(filter_hbox)
+
+        # --- SECTION 5: DIAGNOSTICS (collapsed) ---
+        diag_hbox = QHBoxLayout()
+        self.btn_diag = QToolButton()
+        self.btn_diag.setText("Diagnostics")
+        self.btn_diag.setCheckable(True)
+        self.btn_diag.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.btn_diag.setArrowType(Qt.ArrowType.RightArrow)
+        self.btn_diag.setStyleSheet("border: none;")
+        self.btn_diag.toggled.connect(self.toggle_diagnostics)
+
+        self.chk_trace_file = QCheckBox("Save traces to file")
+        self.chk_trace_file.setToolTip(
+            "Append each run's stage timings as a JSON line to user_data/search_trace.jsonl.")
+
+        diag_hbox.addWidget(self.btn_diag)
+        diag_hbox.addStretch()
+        diag_hbox.addWidget(self.chk_trace_file)
+        main_layout.addLayout(diag_hbox)
+
+        self.diag_text = QPlainTextEdit()
+        self.diag_text.setReadOnly(True)
+        self.diag_text.setPlaceholderText("Stage timings appear here after each search.")
+        self.diag_text.setStyleSheet("font-family: monospace; font-size: 11px;")
+        self.diag_text.setMaximumHeight(170)
+        main_layout.addWidget(self.diag_text)
+
+        self.setLayout(main_layout)
+        
+        # Initial State
+        self.toggle_horizontal_controls()
+        self.toggle_diagnostics(False)
+
+    def toggle_diagnostics(self, expanded):
+        self.btn_diag.setArrowType(Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow)
+        self.diag_text.setVisible(expanded)
+        self.chk_trace_file.setVisible(expanded)
+
+    def toggle_horizontal_controls(self):
+        enabled = self.chk_horizontal.isChecked()
+        self.spin_depth.setEnabled(enabled)
+        self.lbl_depth.setEnabled(enabled)
+        self.spin_mix.setEnabled(enabled)
+        self.lbl_mix.setEnabled(enabled)
+        self.spin_tag_level.setEnabled(enabled)
+        self.lbl_tag_level.setEnabled(enabled)
+
+    # ================= LOGIC =================
+
+    def selected_states(self):
+        return {
+            "learning": self.chk_learning.isChecked(),
+            "young": self.chk_young.isChecked(),
+            "mature": self.chk_mature.isChecked()
+        }
+
+    def run_search(self):
+        if self.search_cancel is not None: return
+
+        # 1. Get Settings (read on the main thread, searched in the background)
+        if self.radio_today.isChecked():
+            start_ms = (mw.col.sched.day_cutoff - 86400) * 1000
+            end_ms = time.time() * 1000 
+        elif self.radio_hours.isChecked():
+            start_ms = (time.time() - (self.spin_hours.value() * 3600)) * 1000
+            end_ms = time.time() * 1000
+        else:
+            start_ms = self.dt_start.dateTime().toMSecsSinceEpoch()
+            end_ms = self.dt_end.dateTime().toMSecsSinceEpoch()
+
+        states = self.selected_states()
+
+        horizontal_mode = self.chk_horizontal.isChecked()
+        depth = self.spin_depth.value()
+        mix_percent = self.spin_mix.value()
+        batch_size = self.spin_limit.value()
+        include_correct = self.chk_include_correct.isChecked()
+        randomize = self.chk_randomize.isChecked()
+        prioritize = self.chk_priority.isChecked()
+        blocks = self.spin_blocks.value()
+        tag_level = self.spin_tag_level.value()
+
+        # Relative windows end "now", so the incremental review cache applies
+        recent = not self.radio_range.isChecked()
+
+        # Result cache key for the timeframe. "Now"-anchored windows are
+        # covered by the collection token (newest revlog id); the sliding
+        # start of "Last X hours" is bucketed to the minute.
+        if self.radio_today.isChecked():
+            window_key = ("today", int(start_ms))
+        elif self.radio_hours.isChecked():
+            window_key = ("hours", self.spin_hours.value(), int(start_ms) // 60000)
+        else:
+            window_key = ("range", int(start_ms), int(end_ms))
+
+        params = (
+            (start_ms, end_ms), states, horizontal_mode, depth,
+            mix_percent, batch_size, include_correct, randomize, recent, window_key, prioritize, blocks, tag_level,
+        )
+        cancel = threading.Event()
+        self.search_cancel = cancel
+        self.set_searching(True)
+
+        op = QueryOp(
+            parent=self,
+            op=lambda col: self.search_op(col, params, cancel),
+            success=self.on_search_done,
+        )
+        op.failure(self.on_search_failed)
+        op.run_in_background()
+
+    def search_op(self, col, params, cancel):
+        # Runs on a background thread: no widget access, only run_on_main
+        (time_range, states, horizontal_mode, depth,
+         mix_percent, batch_size, include_correct, randomize, recent, window_key, prioritize, blocks, tag_level) = params
+
+        def progress(stage, partial_ids=None):
+            if cancel.is_set(): raise SearchCancelled()
+            mw.taskman.run_on_main(lambda: self.show_progress(cancel, stage, partial_ids))
+
+        trace = SearchTrace(
+            start_ms=int(time_range[0]), end_ms=int(time_range[1]), states=states,
+            horizontal=horizontal_mode, depth=depth, recent=recent, prioritize=prioritize, blocks=blocks,
+            tag_level=tag_level)
+        db = CountingDB(col.db, trace)
+
+        # Filters are loaded first so partial results can be shown filtered
+        with trace.stage("load filters") as entry:
+            correct_ids = None
+            if not include_correct:
+                correct_ids = load_correct_ids_from_helper(mw.addonManager.addonsFolder())
+            invalid_ids = load_invalid_ids()
+            cache = qid_file_cache.stats()
+            entry.update(correct=len(correct_ids or ()), invalid=len(invalid_ids),
+                         cache_hits=cache["hits"], cache_misses=cache["misses"])
+
+        def partial_filter(id_set):
+            return filter_set(id_set, invalid_ids, correct_ids)
+
+        # 2. Find IDs (Split into Direct and Horizontal sets)
+        day_cutoff = col.sched.day_cutoff if recent else None
+        direct_ids, horizontal_ids, hops = get_engine().find_ids(
+            db, time_range, states, horizontal_mode, depth,
+            day_cutoff=day_cutoff, progress=progress, partial_filter=partial_filter, trace=trace,
+            window_key=window_key, tag_level=tag_level)
+        progress("Mixing batch")
+
+        # 3. Filtering (Correct & Invalid)
+        with trace.stage("filter") as entry:
+            filtered_direct = partial_filter(direct_ids)
+            filtered_horizontal = partial_filter(horizontal_ids)
+            stats = filter_stats(direct_ids, horizontal_ids, filtered_direct, filtered_horizontal, invalid_ids)
+            entry.update(direct=len(filtered_direct), horizontal=len(filtered_horizontal))
+
+        # 4. Priority weights (one aggregated query per chunk of notes)
+        weights = None
+        if prioritize:
+            progress("Weighting candidates")
+            with trace.stage("priority") as entry:
+                weights = get_engine().weights(
+                    db, filtered_direct + filtered_horizontal, hops)
+                entry.update(weighted=len(weights))
+
+        # 5. Mixing & Selection Logic
+        with trace.stage("mix") as entry:
+            all_ids = mix_batch(
+                filtered_direct, filtered_horizontal, hops, horizontal_mode,
+                depth, mix_percent, batch_size, randomize, weights=weights, blocks=blocks)
+            entry.update(candidates=len(all_ids))
+
+        # Tag Level deeper than the deck's UWorld tags go: say so plainly
+        notice = ""
+        if horizontal_mode and tag_level:
+            levels = get_engine().tag_levels()
+            if not levels:
+                notice = ("Tag Level had no effect: your UWorld tags have no hierarchy below "
+                          "UWorld::Step (e.g. #UWorld::Step::12345).")
+            elif tag_level > levels:
+                notice = f"Tag Level: your UWorld tags only go {levels} level(s) deep below Step."
+        return all_ids, stats, trace, hops, notice
+
+    def on_search_done(self, result):
+        self.set_searching(False)
+        self.all_found_ids, stats, trace, hops, notice = result
+        # Own copy: the search result cache keeps the map it handed out,
+        # and live session answers are added to this one
+        self.horizontal_hops = dict(hops)
+        self.refresh_display(update_timestamp=True, stats=stats)
+        if notice: self.lbl_status.setText(f"{self.lbl_status.text()}\n{notice}")
+        cache = qid_file_cache.stats()
+        self.lbl_status.setToolTip(
+            f"Correct/blocklist file cache: {cache['hits']} hits, {cache['misses']} misses")
+        self.diag_text.setPlainText(trace.format_text())
+        if self.chk_trace_file.isChecked():
+            trace.append_jsonl(os.path.join(get_local_data_dir(), "search_trace.jsonl"))
+
+    def on_search_failed(self, exc):
+        self.set_searching(False)
+        if isinstance(exc, SearchCancelled):
+            self.refresh_display()  # Drop partial results, keep the previous list
+            self.lbl_status.setText("Search cancelled.")
+        else:
+            self.lbl_status.setText("Search failed.")
+            showText(f"Search failed:\n{exc}", parent=self)
+
+    def cancel_search(self):
+        if self.search_cancel is not None:
+            self.search_cancel.set()
+            self.lbl_status.setText("Cancelling...")
+
+    def set_searching(self, searching):
+        if not searching: self.search_cancel = None
+        self.btn_generate.setEnabled(not searching)
+        self.btn_filter.setEnabled(not searching)
+        self.btn_cancel.setVisible(searching)
+        self.btn_cancel.setEnabled(searching)
+        if searching: self.lbl_status.setText("Searching...")
+
+    def show_progress(self, cancel, stage, partial_ids):
+        # Ignore late updates from a search that was cancelled or replaced
+        if cancel is not self.search_cancel or cancel.is_set(): return
+        self.lbl_status.setText(f"{stage}...")
+        if partial_ids is not None:
+            preview = QidSet(partial_ids).to_text()
+            self.text_area.setPlainText(preview or "No direct IDs found yet.")
+
+    def refresh_display(self, update_timestamp=False, stats=None):
+        # Each block keeps its own IDs; removals never move IDs between blocks
+        self.displayed_ids = self.all_found_ids.batch()
+        blocks = self.all_found_ids.block_count
+        
+        # Display
+        while self.tab_blocks.count() > blocks:
+            self.tab_blocks.removeTab(self.tab_blocks.count() - 1)
+        while self.tab_blocks.count() < blocks:
+            self.tab_blocks.addTab(f"Block {self.tab_blocks.count() + 1}")
+        self.tab_blocks.setVisible(blocks > 1)
+        self.show_block()
+
+        # Status
+        if update_timestamp:
+            t_str = datetime.now().strftime("%I:%M %p")
+            count = len(self.displayed_ids) 
+            total = len(self.all_found_ids)
+            
+            msg = f"Generated at {t_str}. Batch contains {count} IDs."
+            if blocks > 1:
+                msg = f"Generated at {t_str}. {blocks} blocks contain {count} IDs."
+            if total > count:
+                msg += f" (Selected from {total} matching candidates)"
+                
+            self.lbl_status.setText(msg)
+        else:
+            count = len(self.all_found_ids)
+            self.lbl_status.setText(f"List updated. {count} valid IDs remaining.")
+
+    def show_block(self):
+        index = min(max(0, self.tab_blocks.currentIndex()), self.all_found_ids.block_count - 1)
+        block = self.all_found_ids.block(index)
+        if block:
+            self.text_area.setPlainText(", ".join(map(str, block)))
+        else:
+            self.text_area.setPlainText("No IDs found matching criteria.")
+
+    def open_filter_dialog(self):
+        text, ok = QInputDialog.getMultiLineText(self, "Paste Error List", 
+            "Paste the full error message from UWorld here:")
+        if ok and text:
+            self.remove_ids(text)
+
+    def remove_ids(self, error_text):
+        bad_ids = set(iter_qids(error_text))
+        if not bad_ids:
+            tooltip("No numbers found.")
+            return
+
+        record_invalid_ids(bad_ids)
+        
+        # 1. Check if we need to shrink the batch size (Refill OFF)
+        displayed_set = set(self.displayed_ids)
+        removed_from_display_count = len(bad_ids & displayed_set)
+        refill = self.chk_refill.isChecked()
+        
+        if not refill and removed_from_display_count > 0 and self.all_found_ids.block_count == 1:
+            # With several blocks only the ones that lost IDs shrink
+            current_limit = self.spin_limit.value()
+            new_limit = max(0, current_limit - removed_from_display_count)
+            self.spin_limit.setValue(new_limit)
+
+        # 2. Filter Master List (only the blocks that lost IDs shrink or refill)
+        total_removed = self.all_found_ids.discard(bad_ids, refill=refill)
+        
+        # 3. Refresh
+        if total_removed > 0:
+            self.refresh_display()
+            if self.chk_refill.isChecked():
+                tooltip(f"Removed {total_removed} IDs and refilled list.")
+            else:
+                tooltip(f"Removed {total_removed} IDs (List shrunk by {removed_from_display_count}).")
+        else:
+            tooltip("No IDs found to remove.")
+
+    def add_reviewed_card(self, card_id):
+        # Live Session: resolve just this card's QIDs, filter off the main thread
+        card = mw.col.get_card(card_id)
+        if not self.selected_states().get(card_state(card.queue, card.ivl)): return
+        qids = set()
+        extract_qids(" ".join(card.note().tags), qids)
+        if not qids: return
+
+        engine = get_engine()
+        neighbours = self.chk_horizontal.isChecked()
+        addons_dir = None if self.chk_include_correct.isChecked() else mw.addonManager.addonsFolder()
+
+        def task():
+            invalid_ids = load_invalid_ids()
+            correct_ids = load_correct_ids_from_helper(addons_dir) if addons_dir else None
+            hops = engine.neighbours(QidSet(qids)) if neighbours else {}
+            return (filter_set(qids, invalid_ids, correct_ids),
+                    filter_set(hops, invalid_ids, correct_ids), hops)
+
+        mw.taskman.run_in_background(task, self.on_live_ids)
+
+    def on_live_ids(self, future):
+        try:
+            direct, horizontal, hops = future.result()
+        except Exception as e:
+            print(f"Error updating live session: {e}")
+            return
+        for qid, hop in hops.items():
+            self.horizontal_hops.setdefault(qid, hop)
+        added = self.all_found_ids.extend(direct + horizontal, self.spin_limit.value())
+        if added:
+            self.refresh_display()
+            self.lbl_status.setText(
+                f"Live session: added {added} IDs from your last review. "
+                f"{len(self.all_found_ids)} candidates in total.")
+
+    def copy_to_clipboard(self):
+        mw.app.clipboard().setText(self.text_area.toPlainText())
+        tooltip("Copied!")
+
+# ============================================================
+# 3) ENTRY POINT
+# ============================================================
+def run_uworld_fetcher():
+    global history_window
+    if not history_window:
+        history_window = UWorldHistoryFetcher(mw)
+    history_window.show()
+    history_window.raise_()
+    history_window.activateWindow()